@@ -0,0 +1,394 @@
+import numpy as np
+
+
+def sigmoid_activation(z):
+    z = np.clip(5.0 * z, -60.0, 60.0)
+    return 1.0 / (1.0 + np.exp(-z))
+
+def tanh_activation(z):
+    z = np.clip(2.5 * z, -60.0, 60.0)
+    return np.tanh(z)
+
+def relu_activation(z):
+    return np.where(z > 0.0, z, 0.0)
+
+def identity_activation(z):
+    return z
+
+# numpy versions of the neat activation functions, by name
+ACTIVATIONS = {
+    "sigmoid_activation": sigmoid_activation,
+    "tanh_activation": tanh_activation,
+    "relu_activation": relu_activation,
+    "identity_activation": identity_activation,
+}
+
+
+class Layer:
+    """
+    The nodes of every network that are the same number of
+    links away from the inputs, stored as flat arrays
+    """
+
+    # the arrays BatchNetwork.save writes for each layer
+    INT_FIELDS = ("rows", "cols", "link_node", "link_row", "link_col")
+    FLOAT_FIELDS = ("bias", "response", "link_weight")
+
+    def __init__(self):
+        self.rows = [] # which network each node belongs to
+        self.cols = [] # where each node's value is kept
+        self.bias = []
+        self.response = []
+        self.activations = []
+        self.link_node = [] # which node in this layer each link feeds
+        self.link_row = []
+        self.link_col = [] # where each link's input value is kept
+        self.link_weight = []
+
+    def freeze(self):
+        """
+        turn the lists into numpy arrays once every node is added
+        :return: None
+        """
+        self.rows = np.array(self.rows, dtype = int)
+        self.cols = np.array(self.cols, dtype = int)
+        self.bias = np.array(self.bias)
+        self.response = np.array(self.response)
+        self.link_node = np.array(self.link_node, dtype = int)
+        self.link_row = np.array(self.link_row, dtype = int)
+        self.link_col = np.array(self.link_col, dtype = int)
+        self.link_weight = np.array(self.link_weight)
+
+        names = set(self.activations)
+        if len(names) == 1:
+            self.activation = ACTIVATIONS[names.pop()]
+            self.activation_groups = None
+        else:
+            self.activation = None
+            self.activation_groups = [(ACTIVATIONS[name], np.array([a == name for a in self.activations]))
+                                      for name in names]
+
+    def activate(self, values):
+        """
+        work out the value of every node in the layer
+        :param values: node values of every network, updated in place
+        :return: None
+        """
+        weighted = values[self.link_row, self.link_col] * self.link_weight
+        s = np.bincount(self.link_node, weights = weighted, minlength = len(self.rows))
+        z = self.bias + self.response * s
+        if self.activation is not None:
+            values[self.rows, self.cols] = self.activation(z)
+        else:
+            for activation, chosen in self.activation_groups:
+                values[self.rows[chosen], self.cols[chosen]] = activation(z[chosen])
+
+
+class Layout:
+    """
+    Where the nodes and links of one network topology go in a
+    BatchNetwork. Networks with the same topology share a Layout and
+    only differ in their weights, biases and responses
+    """
+
+    def __init__(self, input_nodes, output_nodes, node_evals):
+        """
+        work out which layer each node is in and which column holds its value
+        :param input_nodes: keys of the input nodes
+        :param output_nodes: keys of the output nodes
+        :param node_evals: list of (node, activation name, aggregation name,
+                           list of input nodes) in the order the nodes are evaluated
+        :return: None
+        """
+        self.num_inputs = len(input_nodes)
+        self.num_outputs = len(output_nodes)
+        self.nodes = []
+        self.depth = [] # how many links away from the inputs each node is
+        self.cols = [] # where each node's value is kept
+        self.activations = []
+        self.links = [] # (input node, node) of each link
+        self.link_node = [] # which of the nodes each link feeds
+        self.link_col = [] # where each link's input value is kept
+
+        # inputs go first, then outputs, then hidden nodes
+        cols = {}
+        for key in input_nodes + output_nodes:
+            cols[key] = len(cols)
+        depth = dict((key, 0) for key in input_nodes)
+
+        for node, activation, aggregation, inputs in node_evals:
+            if aggregation != "sum_aggregation":
+                raise ValueError("BatchNetwork only supports sum aggregation, not {0}".format(aggregation))
+            if activation not in ACTIVATIONS:
+                raise ValueError("BatchNetwork does not support {0}".format(activation))
+            if node not in cols:
+                cols[node] = len(cols)
+
+            depth[node] = 1 + max([depth[i] for i in inputs] or [0])
+            for i in inputs:
+                self.links.append((i, node))
+                self.link_node.append(len(self.nodes))
+                self.link_col.append(cols[i])
+
+            self.nodes.append(node)
+            self.depth.append(depth[node])
+            self.cols.append(cols[node])
+            self.activations.append(activation)
+
+        self.width = len(cols)
+        self.depth = np.array(self.depth, dtype = int)
+        self.cols = np.array(self.cols, dtype = int)
+        self.link_node = np.array(self.link_node, dtype = int)
+        self.link_col = np.array(self.link_col, dtype = int)
+
+    @staticmethod
+    def key(genome):
+        """
+        everything in a genome that decides its Layout: the nodes with their
+        functions and the enabled connections, but not their values
+        :param genome: neat genome
+        :return: hashable key
+        """
+        nodes = frozenset((key, node.activation, node.aggregation) for key, node in genome.nodes.items())
+        connections = frozenset(key for key, conn in genome.connections.items() if conn.enabled)
+        return nodes, connections
+
+    @staticmethod
+    def create(genome, config):
+        """
+        work out the Layout of a genome's network, the way
+        neat.nn.FeedForwardNetwork.create orders its nodes
+        :param genome: neat genome
+        :param config: NEAT config
+        :return: Layout
+        """
+        from neat.graphs import feed_forward_layers
+        genome_config = config.genome_config
+        connections = sorted(key for key, conn in genome.connections.items() if conn.enabled)
+        inputs = {}
+        for i, node in connections:
+            inputs.setdefault(node, []).append(i)
+
+        node_evals = []
+        for layer in feed_forward_layers(genome_config.input_keys, genome_config.output_keys, connections):
+            for node in layer:
+                gene = genome.nodes[node]
+                node_evals.append((node, genome_config.activation_defs.get(gene.activation).__name__,
+                                   genome_config.aggregation_function_defs.get(gene.aggregation).__name__,
+                                   inputs.get(node, [])))
+        return Layout(genome_config.input_keys, genome_config.output_keys, node_evals)
+
+    def parameters(self, genome):
+        """
+        look up the values of a genome with this Layout
+        :param genome: neat genome
+        :return: (biases, responses, weights), lists in the order of the nodes and links
+        """
+        nodes = genome.nodes
+        connections = genome.connections
+        return ([nodes[key].bias for key in self.nodes], [nodes[key].response for key in self.nodes],
+                [connections[key].weight for key in self.links])
+
+
+class BatchNetwork:
+    """
+    A whole population of feed forward networks, possibly with different
+    topologies, activated together with a few numpy operations per layer
+    """
+
+    def __init__(self, nets):
+        """
+        compile the networks into flat arrays
+        :param nets: list of neat.nn.FeedForwardNetwork with the same inputs and outputs
+        :return: None
+        """
+        layouts = []
+        parameters = []
+        for net in nets:
+            node_evals = [(node, act_func.__name__, agg_func.__name__, [i for i, w in links])
+                          for node, act_func, agg_func, bias, response, links in net.node_evals]
+            layouts.append(Layout(net.input_nodes, net.output_nodes, node_evals))
+            parameters.append(([bias for node, act_func, agg_func, bias, response, links in net.node_evals],
+                               [response for node, act_func, agg_func, bias, response, links in net.node_evals],
+                               [w for node_eval in net.node_evals for i, w in node_eval[5]]))
+        self.assemble(layouts, parameters)
+
+    def assemble(self, layouts, parameters):
+        """
+        put the nodes of every network into layers of flat arrays,
+        network r's values going in row r
+        :param layouts: the Layout of each network
+        :param parameters: (biases, responses, weights) of each network, see Layout.parameters
+        :return: None
+        """
+        self.num_inputs = layouts[0].num_inputs if layouts else 0
+        self.num_outputs = layouts[0].num_outputs if layouts else 0
+        self.values = np.zeros((len(layouts), max([layout.width for layout in layouts] or [0])))
+        self.layers = []
+        if not layouts:
+            return
+
+        # every node and link of every network, in one array each
+        node_counts = [len(layout.nodes) for layout in layouts]
+        link_counts = [len(layout.links) for layout in layouts]
+        node_starts = np.cumsum([0] + node_counts[:-1])
+        rows = np.repeat(np.arange(len(layouts)), node_counts)
+        depth = np.concatenate([layout.depth for layout in layouts])
+        cols = np.concatenate([layout.cols for layout in layouts])
+        activations = [name for layout in layouts for name in layout.activations]
+        bias = np.array([value for biases, responses, weights in parameters for value in biases], dtype = float)
+        response = np.array([value for biases, responses, weights in parameters for value in responses], dtype = float)
+        link_row = np.repeat(np.arange(len(layouts)), link_counts)
+        link_target = np.concatenate([layout.link_node + start for layout, start in zip(layouts, node_starts.tolist())])
+        link_col = np.concatenate([layout.link_col for layout in layouts])
+        link_weight = np.array([value for biases, responses, weights in parameters for value in weights], dtype = float)
+        link_depth = depth[link_target]
+
+        position = np.zeros(len(depth), dtype = int) # where each node goes in its layer
+        for d in np.unique(depth).tolist():
+            chosen = np.flatnonzero(depth == d)
+            position[chosen] = np.arange(len(chosen))
+            linked = np.flatnonzero(link_depth == d)
+
+            layer = Layer()
+            layer.rows = rows[chosen]
+            layer.cols = cols[chosen]
+            layer.bias = bias[chosen]
+            layer.response = response[chosen]
+            layer.activations = [activations[i] for i in chosen.tolist()]
+            layer.link_node = position[link_target[linked]]
+            layer.link_row = link_row[linked]
+            layer.link_col = link_col[linked]
+            layer.link_weight = link_weight[linked]
+            layer.freeze()
+            self.layers.append(layer)
+
+    @staticmethod
+    def create(genomes, config, cache = None):
+        """
+        build the networks for a list of genomes. Working out a topology's
+        Layout is the slow part, so genomes with the same one (like most
+        offspring and their parents) can share it through a cache, and
+        only have their weights, biases and responses looked up
+        :param genomes: list of genomes
+        :param config: NEAT config
+        :param cache: LRUCache of Layouts by Layout.key, None to work out every one
+        :return: BatchNetwork
+        """
+        layouts = []
+        parameters = []
+        for genome in genomes:
+            layout = None
+            if cache is not None:
+                key = Layout.key(genome)
+                layout = cache.get(key)
+            if layout is None:
+                layout = Layout.create(genome, config)
+                if cache is not None:
+                    cache.put(key, layout)
+            layouts.append(layout)
+            parameters.append(layout.parameters(genome))
+
+        net = BatchNetwork([])
+        net.assemble(layouts, parameters)
+        return net
+
+    def repeat(self, copies):
+        """
+        the same networks several times over, so each can be fed several
+        sets of inputs in one activation. Copy c of network r is row
+        c * networks + r, and the layers are tiled rather than compiled again
+        :param copies: number of copies of each network
+        :return: BatchNetwork
+        """
+        if copies == 1:
+            return self
+        networks, width = self.values.shape
+        net = BatchNetwork([])
+        net.num_inputs = self.num_inputs
+        net.num_outputs = self.num_outputs
+        net.values = np.zeros((networks * copies, width))
+        offsets = np.arange(copies)[:, None]
+        for layer in self.layers:
+            tiled = Layer()
+            tiled.rows = (layer.rows + offsets * networks).ravel()
+            tiled.link_row = (layer.link_row + offsets * networks).ravel()
+            tiled.link_node = (layer.link_node + offsets * len(layer.rows)).ravel()
+            for field in ("cols", "link_col") + Layer.FLOAT_FIELDS:
+                setattr(tiled, field, np.tile(getattr(layer, field), copies))
+            tiled.activations = layer.activations * copies
+            tiled.freeze()
+            net.layers.append(tiled)
+        return net
+
+    def activate(self, inputs):
+        """
+        activate every network at once
+        :param inputs: array of shape (networks, inputs)
+        :return: array of shape (networks, outputs)
+        """
+        values = self.values
+        if not len(values):
+            return np.zeros((len(inputs), self.num_outputs))
+        values[:, :self.num_inputs] = inputs
+        for layer in self.layers:
+            layer.activate(values)
+
+        return values[:, self.num_inputs:self.num_inputs + self.num_outputs].copy()
+
+    def save(self, file):
+        """
+        write the compiled networks to an .npz file, which load() reads
+        back without neat or pickle. Everything is packed into one int
+        table and one float table, so loading only reads three arrays:
+        ints: num_inputs, num_outputs, networks, width, layers,
+              then for each layer: nodes, links, and the INT_FIELDS
+        floats: the FLOAT_FIELDS of each layer
+        :param file: file name or binary file object
+        :return: None
+        """
+        names = sorted(set(name for layer in self.layers for name in layer.activations))
+        ints = [np.array([self.num_inputs, self.num_outputs, self.values.shape[0], self.values.shape[1], len(self.layers)])]
+        floats = [np.zeros(0)]
+        for layer in self.layers:
+            ints.append(np.array([len(layer.rows), len(layer.link_node)]))
+            ints.append(np.array([names.index(name) for name in layer.activations], dtype = int))
+            ints.extend(getattr(layer, field) for field in Layer.INT_FIELDS)
+            floats.extend(getattr(layer, field) for field in Layer.FLOAT_FIELDS)
+        np.savez(file, ints = np.concatenate(ints).astype(np.int64), floats = np.concatenate(floats),
+                 activation_names = np.array(names, dtype = str))
+
+    @staticmethod
+    def load(file):
+        """
+        read networks written by save()
+        :param file: file name or binary file object
+        :return: BatchNetwork
+        """
+        with np.load(file, allow_pickle = False) as arrays:
+            ints = arrays["ints"]
+            floats = arrays["floats"]
+            names = arrays["activation_names"].tolist()
+
+        net = BatchNetwork([])
+        net.num_inputs, net.num_outputs, rows, width, depth = ints[:5].tolist()
+        net.values = np.zeros((rows, width))
+        i = 5
+        f = 0
+        for d in range(depth):
+            nodes, links = ints[i:i + 2].tolist()
+            i += 2
+            layer = Layer()
+            layer.activations = [names[a] for a in ints[i:i + nodes].tolist()]
+            i += nodes
+            for field in Layer.INT_FIELDS:
+                size = links if field.startswith("link_") else nodes
+                setattr(layer, field, ints[i:i + size])
+                i += size
+            for field in Layer.FLOAT_FIELDS:
+                size = links if field.startswith("link_") else nodes
+                setattr(layer, field, floats[f:f + size])
+                f += size
+            layer.freeze()
+            net.layers.append(layer)
+        return net
@@ -0,0 +1,418 @@
+"""
+Benchmarks for the hot paths of Happy Bee, from single calls like
+Bee.move up to whole headless training generations.
+
+    python benchmark.py                 run them and compare with this machine's baseline
+    python benchmark.py --save          run them and store the results as this machine's baseline
+    python benchmark.py --only collide  run only the benchmarks with "collide" in their name
+
+Baselines are kept in benchmarks/<machine tag>.json, because the numbers
+only mean something compared with runs on the same machine.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import functools
+import platform
+import importlib.util
+
+# draw into memory, the benchmarks shouldn't open a window
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame
+import neat
+
+import game
+from batchnet import BatchNetwork
+from cache import LRUCache
+from render import Renderer
+from speciation import BatchSpeciesSet
+from game import Bee, Pipe, Ground, Swarm
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BASELINE_DIR = os.path.join(ROOT, "benchmarks")
+
+BENCHMARKS = [] # (name, unit, setup) in the order they run
+
+hb = None # the happy-bee.py module
+config = None
+
+
+def benchmark(name, unit):
+    """
+    register a benchmark. The decorated function sets it up and
+    returns a step function, which does some work and returns how
+    many units of it it did
+    :param name: name of the benchmark
+    :param unit: what the step function counts, like "moves"
+    :return: decorator
+    """
+    def register(setup):
+        BENCHMARKS.append((name, unit, setup))
+        return setup
+    return register
+
+
+def measure(step, min_time = 0.2, repeat = 3):
+    """
+    call a step function over and over for a while
+    :param step: function returning the units of work it did
+    :param min_time: seconds each round lasts at least
+    :param repeat: rounds to run
+    :return: units per second of the fastest round
+    """
+    best = 0
+    for r in range(repeat):
+        units = 0
+        start = time.perf_counter()
+        while True:
+            units += step()
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        best = max(best, units / elapsed)
+    return best
+
+
+def load_game():
+    """
+    import happy-bee.py (which can't be imported by name) and set up
+    its window, images and NEAT config
+    :return: None
+    """
+    global hb, config
+    spec = importlib.util.spec_from_file_location("happy_bee", os.path.join(ROOT, "happy-bee.py"))
+    hb = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(hb)
+    hb.init_window()
+    hb.BEST = float("inf") # don't save best.pickle while benchmarking
+    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                                BatchSpeciesSet, neat.DefaultStagnation,
+                                hb.CONFIG_PATH)
+
+
+def evolved_genomes(n, mutations = 30, seed = 1):
+    """
+    genomes with topologies like the ones training evolves, made by
+    mutating new genomes a number of times
+    :param n: number of genomes
+    :param mutations: times each genome is mutated
+    :param seed: seed for the mutations
+    :return: list of genomes
+    """
+    random.seed(seed)
+    genomes = []
+    for key in range(n):
+        genome = config.genome_type(key)
+        genome.configure_new(config.genome_config)
+        for m in range(mutations):
+            genome.mutate(config.genome_config)
+        genomes.append(genome)
+    return genomes
+
+
+@benchmark("bee_move", "moves")
+def bench_bee_move():
+    bee = Bee(230, 350, hb.bee_img)
+
+    def step():
+        bee.y = 350
+        for i in range(1000):
+            if i % 10 == 0:
+                bee.flap()
+            bee.move()
+        return 1000
+    return step
+
+
+@benchmark("swarm_move_500", "bee-moves")
+def bench_swarm_move():
+    swarm = Swarm(500, 230, 350, hb.bee_img)
+    flapping = np.arange(500) % 10 == 0
+
+    def step():
+        swarm.y[:] = 350
+        for i in range(100):
+            swarm.flap(flapping)
+            swarm.move()
+        return 100 * 500
+    return step
+
+
+@benchmark("pipe_collide", "checks")
+def bench_pipe_collide():
+    # the bee is level with the pipe, so the masks are compared
+    bee = Bee(230, 350, hb.bee_img)
+    pipe = Pipe(200, hb.pipe_img, 250)
+
+    def step():
+        for i in range(1000):
+            pipe.collide(bee, None)
+        return 1000
+    return step
+
+
+@benchmark("swarm_collide_500", "bee-checks")
+def bench_swarm_collide():
+    swarm = Swarm(500, 230, 350, hb.bee_img)
+    rng = np.random.default_rng(1)
+    swarm.y[:] = rng.uniform(50, 650, 500)
+    swarm.tilt[:] = rng.choice(Bee.reachable_tilts(), 500)
+    pipe = Pipe(200, hb.pipe_img, 250)
+
+    def step():
+        for i in range(10):
+            swarm.collide(pipe)
+        return 10 * 500
+    return step
+
+
+@benchmark("feedforward_activate", "activations")
+def bench_feedforward_activate():
+    nets = [neat.nn.FeedForwardNetwork.create(genome, config) for genome in evolved_genomes(100)]
+    inputs = [(350.0, 100.0, -100.0)] * 10
+
+    def step():
+        for net in nets:
+            for i in inputs:
+                net.activate(i)
+        return len(nets) * len(inputs)
+    return step
+
+
+@benchmark("batch_activate_500", "activations")
+def bench_batch_activate():
+    net = BatchNetwork.create(evolved_genomes(500), config)
+    inputs = np.random.default_rng(1).uniform(-400, 400, (500, 3))
+
+    def step():
+        for i in range(10):
+            net.activate(inputs)
+        return 10 * 500
+    return step
+
+
+@benchmark("batch_create_500", "networks")
+def bench_batch_create():
+    genomes = evolved_genomes(500)
+
+    def step():
+        BatchNetwork.create(genomes, config)
+        return 500
+    return step
+
+
+@benchmark("batch_create_cached_500", "networks")
+def bench_batch_create_cached():
+    # offspring that only differ from their parents in weights,
+    # so every topology is already in the compile cache
+    genomes = evolved_genomes(500)
+    cache = LRUCache(1000)
+    BatchNetwork.create(genomes, config, cache)
+
+    def step():
+        BatchNetwork.create(genomes, config, cache)
+        return 500
+    return step
+
+
+@benchmark("speciate_2000", "genomes")
+def bench_speciate():
+    population = dict((genome.key, genome) for genome in evolved_genomes(2000, mutations = 10))
+    species = BatchSpeciesSet(config.species_set_config, neat.reporting.ReporterSet())
+    species.speciate(config, population, 0)
+
+    def step():
+        species.speciate(config, population, 1)
+        return len(population)
+    return step
+
+
+@benchmark("blit_rotate_center", "blits")
+def bench_blit_rotate_center():
+    surf = pygame.Surface((game.WIDTH, game.HEIGHT))
+    tilts = Bee.reachable_tilts()
+
+    def step():
+        for tilt in tilts:
+            game.blitRotateCenter(surf, hb.bee_img, (230, 350), tilt)
+        return len(tilts)
+    return step
+
+
+@benchmark("draw_window_train_100", "frames")
+def bench_draw_window_train():
+    renderer = Renderer(hb.WINDOW, hb.sky_img)
+    swarm = Swarm(100, 230, 350, hb.bee_img)
+    swarm.y[:] = np.random.default_rng(1).uniform(50, 650, 100)
+    ground = Ground(game.FLOOR, hb.ground_img)
+    pipes = [Pipe(300, hb.pipe_img, 250), Pipe(650, hb.pipe_img, 300)]
+
+    def step():
+        for i in range(10):
+            ground.move()
+            for pipe in pipes:
+                pipe.move()
+            hb.draw_window_train(renderer, [swarm], ground, pipes, 3, 1, False)
+        for pipe in pipes:
+            pipe.x += 10 * Pipe.VEL
+        return 10
+    return step
+
+
+@benchmark("draw_window_train_2000", "frames")
+def bench_draw_window_train_lod():
+    # too many bees to draw them all, only the ones lined up best with the gap and a sample are
+    renderer = Renderer(hb.WINDOW, hb.sky_img)
+    rng = np.random.default_rng(1)
+    swarm = Swarm(2000, 230, 350, hb.bee_img)
+    swarm.y[:] = rng.uniform(50, 650, 2000)
+    gaps = np.full(2000, 250 + Pipe.GAP / 2)
+    ground = Ground(game.FLOOR, hb.ground_img)
+    pipes = [Pipe(300, hb.pipe_img, 250), Pipe(650, hb.pipe_img, 300)]
+
+    def step():
+        for i in range(10):
+            ground.move()
+            for pipe in pipes:
+                pipe.move()
+            hb.draw_window_train(renderer, [swarm], ground, pipes, 3, 1, False, [gaps])
+        for pipe in pipes:
+            pipe.x += 10 * Pipe.VEL
+        return 10
+    return step
+
+
+def bench_generation(pop_size, courses = 1):
+    """
+    a whole headless generation through eval_genomes. The unit is
+    bee-frames: one bee simulated for one frame
+    :param pop_size: genomes in the generation
+    :param courses: courses each genome flies
+    :return: step function
+    """
+    genomes = list(enumerate(evolved_genomes(pop_size, mutations = 3)))
+    counted = [0]
+
+    class CountingSwarm(Swarm):
+        def move(self):
+            counted[0] += int(self.alive.sum())
+            Swarm.move(self)
+
+    def step():
+        hb.HEADLESS = True
+        hb.SEED = 1
+        hb.gen = 0
+        hb.MAX_FRAMES = 5000 # the odd bee could otherwise fly until the threshold
+        hb.COURSES = courses
+        hb.Swarm = CountingSwarm
+        counted[0] = 0
+        try:
+            hb.eval_genomes(genomes, config)
+        finally:
+            hb.Swarm = Swarm
+            hb.HEADLESS = False
+            hb.COURSES = 1
+        return counted[0]
+    return step
+
+for size in (25, 100, 500):
+    benchmark("generation_{0}".format(size), "bee-frames")(functools.partial(bench_generation, size))
+benchmark("generation_100_courses_4", "bee-frames")(functools.partial(bench_generation, 100, 4))
+
+
+def machine():
+    """
+    describe this machine, the benchmarks only compare with
+    baselines from the same one
+    :return: (tag, dict of details)
+    """
+    details = {
+        "node": platform.node(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+        "system": platform.platform(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pygame": pygame.version.ver,
+    }
+    tag = "{0}-{1}-py{2}".format(details["node"], details["machine"], "".join(platform.python_version_tuple()[:2]))
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in tag), details
+
+
+def report(results, baseline, tolerance):
+    """
+    print the results next to the baseline's
+    :param results: {name: {"rate": units per second, "unit": unit}}
+    :param baseline: results of an earlier run, or None
+    :param tolerance: fraction slower than the baseline that counts as a regression
+    :return: names of the benchmarks that regressed
+    """
+    regressed = []
+    print("{0:<24}{1:>14}  {2:<12}{3:>14}{4:>10}".format("benchmark", "rate", "unit", "baseline", "change"))
+    for name, result in results.items():
+        line = "{0:<24}{1:>14,.0f}  {2:<12}".format(name, result["rate"], result["unit"] + "/s")
+        old = baseline.get(name) if baseline else None
+        if old:
+            change = result["rate"] / old["rate"] - 1
+            line += "{0:>14,.0f}{1:>+9.1%}".format(old["rate"], change)
+            if change < -tolerance:
+                line += "  SLOWER"
+                regressed.append(name)
+        print(line)
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Happy Bee benchmarks")
+    parser.add_argument("--only", default = "",
+                        help = "run only the benchmarks with this in their name")
+    parser.add_argument("--save", action = "store_true",
+                        help = "store the results as this machine's baseline")
+    parser.add_argument("--baseline", default = None,
+                        help = "baseline file to compare with, this machine's by default")
+    parser.add_argument("--tolerance", type = float, default = 0.1,
+                        help = "fraction slower than the baseline that counts as a regression")
+    parser.add_argument("--min-time", type = float, default = 0.2,
+                        help = "seconds each round of a benchmark lasts at least")
+    args = parser.parse_args()
+
+    tag, details = machine()
+    baseline_file = args.baseline or os.path.join(BASELINE_DIR, tag + ".json")
+    baseline = None
+    if os.path.exists(baseline_file):
+        with open(baseline_file) as f:
+            baseline = json.load(f)["results"]
+
+    load_game()
+    results = {}
+    for name, unit, setup in BENCHMARKS:
+        if args.only in name:
+            results[name] = {"rate": measure(setup(), args.min_time), "unit": unit}
+
+    print("machine: {0}".format(tag))
+    if baseline is None:
+        print("no baseline at {0}, run with --save to store one".format(baseline_file))
+    regressed = report(results, baseline, args.tolerance)
+
+    if args.save:
+        if baseline:
+            # keep the benchmarks that weren't run this time
+            results = dict(baseline, **results)
+        os.makedirs(os.path.dirname(os.path.abspath(baseline_file)), exist_ok = True)
+        with open(baseline_file, "w") as f:
+            json.dump({"machine": details, "time": time.strftime("%Y-%m-%d %H:%M:%S"), "results": results},
+                      f, indent = 2)
+        print("saved baseline to {0}".format(baseline_file))
+
+    if regressed:
+        print("{0} benchmark(s) slower than the baseline: {1}".format(len(regressed), ", ".join(regressed)))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+import hashlib
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    A dictionary with a maximum size that forgets the least
+    recently used entry first, and counts its hits and misses
+    """
+
+    def __init__(self, size):
+        """
+        Initialize the object
+        :param size: most entries to keep, 0 turns the cache off
+        :return: None
+        """
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """
+        look up an entry, marking it as recently used
+        :param key: hashable key
+        :return: the value, None if it isn't cached
+        """
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        """
+        add an entry, forgetting the oldest one if the cache is full
+        :param key: hashable key
+        :param value: anything but None
+        :return: None
+        """
+        if self.size <= 0:
+            return
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last = False)
+
+
+def genome_key(genome):
+    """
+    a digest of everything in a genome that changes how its bee flies:
+    the nodes and the enabled connections with their weights
+    :param genome: neat genome
+    :return: bytes
+    """
+    nodes = sorted((key, node.bias, node.response, node.activation, node.aggregation)
+                   for key, node in genome.nodes.items())
+    connections = sorted((key, conn.weight) for key, conn in genome.connections.items() if conn.enabled)
+    return hashlib.sha1(repr((nodes, connections)).encode()).digest()
+
+
+class FitnessCache(LRUCache):
+    """
+    Remembers the fitness of genomes on each course, so genomes carried
+    over unchanged (like the elites) don't have to fly the same course again
+    """
+
+    @staticmethod
+    def key(genome, course_id):
+        """
+        :param genome: neat genome
+        :param course_id: the seed of the course the genome flew
+        :return: hashable key
+        """
+        return (genome_key(genome), course_id)
@@ -0,0 +1,104 @@
+import glob
+import gzip
+import pickle
+import random
+import itertools
+
+import neat
+
+
+class Checkpointer(neat.Checkpointer):
+    """
+    neat's Checkpointer, but the checkpoints are compressed and written by a
+    BackgroundWriter, and they also keep the reporters' and the game's state
+    """
+
+    def __init__(self, writer, state, generation_interval = 5, time_interval_seconds = None,
+                 filename_prefix = "happy-bee-checkpoint-"):
+        """
+        :param writer: BackgroundWriter
+        :param state: function returning a picklable dict of anything else to save
+        :param generation_interval: generations between checkpoints, None for no limit
+        :param time_interval_seconds: seconds between checkpoints, None for no limit
+        :param filename_prefix: the generation number is added to the end
+        :return: None
+        """
+        neat.Checkpointer.__init__(self, generation_interval, time_interval_seconds, filename_prefix)
+        self.writer = writer
+        self.state = state
+
+    def save_checkpoint(self, config, population, species_set, generation):
+        """
+        save the state at the end of a generation. Only pickling happens
+        here, the population is the next generation's, so a restored
+        run carries on from generation + 1
+        :return: None
+        """
+        filename = "{0}{1}".format(self.filename_prefix, generation)
+        print("Saving checkpoint to {0}".format(filename))
+        data = Checkpointer.dumps(config, population, species_set, generation, self.state())
+        self.writer.write(filename, data, compress = True)
+
+    @staticmethod
+    def dumps(config, population, species_set, generation, state):
+        """
+        pickle the state at the end of a generation, ready to carry on
+        from generation + 1
+        :param config: NEAT config
+        :param population: the next generation's genomes
+        :param species_set: the species they are divided into
+        :param generation: the generation that just ended
+        :param state: picklable dict of anything else to save
+        :return: bytes
+        """
+        # the species set keeps the reporters, which needn't (and can't
+        # always) be pickled, loads() hooks it up to the new ones
+        reporters = species_set.reporters
+        species_set.reporters = None
+        try:
+            data = (generation + 1, config, population, species_set, random.getstate(), state)
+            return pickle.dumps(data, protocol = pickle.HIGHEST_PROTOCOL)
+        finally:
+            species_set.reporters = reporters
+
+    @staticmethod
+    def loads(data):
+        """
+        unpickle the state dumps() pickled, and put the random module back how it was
+        :param data: bytes
+        :return: (neat.Population, dict of the other saved state)
+        """
+        generation, config, population, species_set, rndstate, state = pickle.loads(data)
+        random.setstate(rndstate)
+        p = neat.Population(config, (population, species_set, generation))
+        # neat doesn't hook the restored species set up to the new reporters,
+        # or carry on numbering genomes where the saved run left off
+        p.species.reporters = p.reporters
+        p.reproduction.genome_indexer = itertools.count(max(population) + 1)
+        return p, state
+
+    @staticmethod
+    def latest(filename_prefix = "happy-bee-checkpoint-"):
+        """
+        find the checkpoint of the latest generation
+        :param filename_prefix: prefix the checkpoints were saved with
+        :return: file name, None if there are no checkpoints
+        """
+        generations = {}
+        for filename in glob.glob(glob.escape(filename_prefix) + "*"):
+            suffix = filename[len(filename_prefix):]
+            if suffix.isdigit():
+                generations[int(suffix)] = filename
+        if not generations:
+            return None
+        return generations[max(generations)]
+
+    @staticmethod
+    def restore_checkpoint(filename):
+        """
+        load a checkpoint and put the random module back how it was
+        :param filename: checkpoint to load
+        :return: (neat.Population, dict of the other saved state)
+        """
+        with gzip.open(filename) as f:
+            return Checkpointer.loads(f.read())
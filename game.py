@@ -0,0 +1,575 @@
+import pygame
+import random
+import os
+import array
+import numpy as np
+
+WIDTH = 500
+HEIGHT = 800
+FLOOR = 700
+
+
+class Course:
+    """
+    A seeded sequence of pipe heights, worked out up front so a run never
+    calls random while it is playing. The same seed always gives the same
+    course, so it can be shared by every bee, worker and generation
+    """
+    LENGTH = 256 # heights worked out at a time
+
+    def __init__(self, seed = None):
+        """
+        Initialize the object
+        :param seed: seed for the pipe heights, None for a random course
+        :return: None
+        """
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        self.seed = seed
+        self.heights = array.array("h")
+        self._rng = random.Random(seed)
+        self._last_height = 250
+        self.extend()
+
+    @staticmethod
+    def bank(seed, count):
+        """
+        make several different courses from one seed
+        :param seed: seed for the bank
+        :param count: number of courses
+        :return: list of Course
+        """
+        rng = random.Random(seed)
+        return [Course(rng.randrange(2 ** 32)) for i in range(count)]
+
+    def extend(self):
+        """
+        work out the next LENGTH pipe heights
+        :return: None
+        """
+        rng = self._rng
+        for i in range(self.LENGTH):
+            height = self._last_height + rng.randrange(-250, 250)
+            if height < 75:
+                height = rng.randrange(75, 125)
+            if height > 425:
+                height = rng.randrange(375, 425)
+            self.heights.append(height)
+            self._last_height = height
+
+    def __getitem__(self, i):
+        """
+        height of the i'th pipe of the course, from the top of the screen
+        :param i: int
+        :return: int
+        """
+        while i >= len(self.heights):
+            self.extend()
+        return self.heights[i]
+
+_images = {} # the loaded images, with and without converting
+
+def load_images(convert = True):
+    """
+    load and scale the game images, only the first time
+    :param convert: convert the images for fast blitting (needs a display)
+    :return: (sky, ground, pipe, bee) surfaces
+    """
+    if convert in _images:
+        return _images[convert]
+
+    def load(name, size):
+        img = pygame.image.load(os.path.join(os.path.dirname(os.path.abspath(__file__)), "images", name))
+        if convert:
+            img = img.convert_alpha()
+        return pygame.transform.scale(img, size)
+
+    _images[convert] = (load("sky.png", (500, 700)), load("ground.png", (500, 100)),
+                        load("pipe.png", (400, 450)), load("bee.png", (50, 50)))
+    return _images[convert]
+
+_rotated = {} # (rotated image, offset) for each image and angle
+_masks = {} # (mask, offset, opaque bounds) for each image and angle
+_flipped = {} # upside down copy of each image
+
+def rotated(image, angle = 0):
+    """
+    get an image rotated about its center. Each angle is rotated
+    once and then reused
+    :param image: the image surface
+    :param angle: a float value for angle
+    :return: (rotated image, offset) - offset is the top left of the rotated
+        image relative to the top left of the unrotated one
+    """
+    key = (image, angle)
+    if key not in _rotated:
+        rotated_image = pygame.transform.rotate(image, angle) if angle else image
+        offset = rotated_image.get_rect(center = image.get_rect().center).topleft
+        _rotated[key] = (rotated_image, offset)
+    return _rotated[key]
+
+def rotated_mask(image, angle = 0):
+    """
+    get the mask of an image rotated about its center, the same way
+    blitRotateCenter draws it. Masks are made once and then reused
+    :param image: the image surface
+    :param angle: a float value for angle
+    :return: (mask, offset, bounds) - offset is the top left of the rotated
+        image and bounds the Rect of its opaque pixels, both relative to the
+        top left of the unrotated image
+    """
+    key = (image, angle)
+    if key not in _masks:
+        rotated_image, offset = rotated(image, angle)
+        mask = pygame.mask.from_surface(rotated_image)
+        _masks[key] = (mask, offset, rotated_image.get_bounding_rect().move(offset))
+    return _masks[key]
+
+def prerotate(image):
+    """
+    rotate a bee image and make its masks for every tilt a bee can
+    reach, so drawing and collisions never have to rotate mid game
+    :param image: the bee surface
+    :return: None
+    """
+    for angle in Bee.reachable_tilts():
+        rotated_mask(image, angle)
+
+def flipped(image):
+    """
+    get an upside down copy of an image, made once and then reused
+    :param image: the image surface
+    :return: surface
+    """
+    if image not in _flipped:
+        _flipped[image] = pygame.transform.flip(image, False, True)
+    return _flipped[image]
+
+def blitRotateCenter(surf, image, topleft, angle):
+    """
+    Rotate a surface and blit it to the window
+    :param surf: the surface to blit to
+    :param image: the image surface to rotate
+    :param topLeft: the top left position of the image
+    :param angle: a float value for angle
+    :return: Rect that was drawn on
+    """
+    rotated_image, offset = rotated(image, angle)
+    return surf.blit(rotated_image, image.get_rect(topleft = topleft).move(offset).topleft)
+
+class Bee:
+    """
+    Bee object for Happy Bee
+    """
+    MAX_ROTATION = 25
+    ROT_VEL = 20
+
+    def __init__(self, x, y, img):
+        """
+        Initialize the object
+        :param x: starting x pos (int)
+        :param y: starting y pos (int)
+        :return: None
+        """
+        self.x = x
+        self.y = y
+        self.tilt = 0  # degrees to tilt
+        self.tick_count = 0 # time since last flap
+        self.vel = 0 # downward velocity (positive is downward)
+        self.img = img
+
+    def flap(self):
+        """
+        flap the bee upward
+        :return: None
+        """
+        self.vel = -10
+        self.tick_count = 0
+
+    def move(self):
+        """
+        move the bee
+        :return: None
+        """
+        self.tick_count += 1
+
+        vert_displacement = self.vel*(self.tick_count) + 0.5*(3)*(self.tick_count)**2  # calculate displacement
+
+        # terminal velocity
+        if vert_displacement >= 16:
+            vert_displacement = (vert_displacement/abs(vert_displacement)) * 16
+
+        elif vert_displacement < 0:
+            vert_displacement -= 1
+
+        self.y = self.y + vert_displacement
+
+        #if vert_displacement < 0 or self.y < self.height + 50:  # tilt up
+        if vert_displacement < 0: # tilt up
+            if self.tilt < self.MAX_ROTATION:
+                self.tilt = self.MAX_ROTATION
+        else:  # tilt down
+            if self.tilt > -90:
+                self.tilt -= self.ROT_VEL
+
+    @classmethod
+    def reachable_tilts(cls):
+        """
+        every tilt move() can give a bee that starts level
+        :return: sorted list of angles
+        """
+        tilts = set()
+        todo = [0]
+        while todo:
+            tilt = todo.pop()
+            if tilt in tilts:
+                continue
+            tilts.add(tilt)
+            todo.append(max(tilt, cls.MAX_ROTATION)) # tilt up
+            todo.append(tilt - cls.ROT_VEL if tilt > -90 else tilt) # tilt down
+        return sorted(tilts)
+
+    def get_mask(self):
+        """
+        get the mask for the bee at its current tilt
+        :return: pygame mask
+        """
+        return rotated_mask(self.img, self.tilt)[0]
+
+    def draw(self, window):
+        """
+        draw the bee
+        :param window: pygame surface to draw the bee on
+        :return: Rect that was drawn on
+        """
+
+        # tilt the bird
+        return blitRotateCenter(window, self.img, (self.x, self.y), self.tilt)
+
+STRIP_WIDTH = 16
+STRIP_ROW = 8 # height of each row of the strip
+STRIP_ROWS = HEIGHT // STRIP_ROW
+STRIP_COLOR = (255, 200, 0)
+
+def strip_counts(ys, img):
+    """
+    count the bees in each row of the strip
+    :param ys: array of the y pos of the bees
+    :param img: bee surface
+    :return: int array of STRIP_ROWS counts
+    """
+    centre = ys + img.get_height() / 2
+    return np.bincount(np.clip(centre // STRIP_ROW, 0, STRIP_ROWS - 1).astype(int), minlength = STRIP_ROWS)
+
+def draw_strip(surf, img, x, counts):
+    """
+    draw bees that are too many to draw one by one as a strip down
+    the screen at their x pos, more solid where more of them are
+    :param surf: the surface to draw on
+    :param img: bee surface
+    :param x: x pos of the bees
+    :param counts: the bees in each row, from strip_counts
+    :return: Rect of the strip
+    """
+    strip = pygame.Surface((1, STRIP_ROWS), pygame.SRCALPHA)
+    strip.fill(STRIP_COLOR)
+    alpha = pygame.surfarray.pixels_alpha(strip)
+    alpha[0] = np.where(counts > 0, 90 + 165 * counts // max(1, counts.max()), 0)
+    del alpha # unlocks the surface
+    strip = pygame.transform.scale(strip, (STRIP_WIDTH, STRIP_ROWS * STRIP_ROW))
+    return surf.blit(strip, (x + (img.get_width() - STRIP_WIDTH) // 2, 0))
+
+
+class Swarm:
+    """
+    A whole population of bees kept as arrays, so every bee moves
+    in one step instead of one Bee object at a time
+    """
+    # when there are too many bees to draw, only the TOP lined up best
+    # with their next gap and a sample of SAMPLED others are drawn, and
+    # the rest are shown as a strip at their x pos (see draw_strip)
+    TOP = 25
+    SAMPLED = 25
+
+    def __init__(self, n, x, y, img, course = None):
+        """
+        Initialize the object
+        :param n: number of bees
+        :param x: x pos of every bee (int)
+        :param y: starting y pos of every bee (int)
+        :param img: bee surface
+        :param course: int array of the course each bee flies, when the
+                       bees fly several courses at once (see Pipe), None
+                       when they all fly the same one
+        :return: None
+        """
+        self.x = x
+        self.course = course
+        self.y = np.full(n, y, dtype = float)
+        self.tilt = np.zeros(n, dtype = int)  # degrees to tilt
+        self.tick_count = np.zeros(n, dtype = int) # time since last flap
+        self.vel = np.zeros(n, dtype = int) # downward velocity (positive is downward)
+        self.alive = np.ones(n, dtype = bool)
+        self.img = img
+        # which bees are in the sample: the living ones with the lowest rank,
+        # so the same bees stay drawn until they die
+        self.rank = np.random.default_rng().permutation(n)
+
+    def flap(self, flapping):
+        """
+        flap the chosen bees upward
+        :param flapping: bool array, True for the bees that flap
+        :return: None
+        """
+        self.vel[flapping] = -10
+        self.tick_count[flapping] = 0
+
+    def move(self):
+        """
+        move the living bees, same rules as Bee.move
+        :return: None
+        """
+        alive = self.alive
+        self.tick_count += alive
+
+        ticks = self.tick_count
+        vert_displacement = self.vel*ticks + 0.5*(3)*ticks**2  # calculate displacement
+
+        # terminal velocity
+        vert_displacement = np.where(vert_displacement >= 16, 16.0,
+            np.where(vert_displacement < 0, vert_displacement - 1, vert_displacement))
+
+        np.copyto(self.y, self.y + vert_displacement, where = alive)
+
+        tilt = np.where(vert_displacement < 0,
+            np.maximum(self.tilt, Bee.MAX_ROTATION), # tilt up
+            np.where(self.tilt > -90, self.tilt - Bee.ROT_VEL, self.tilt)) # tilt down
+        np.copyto(self.tilt, tilt, where = alive)
+
+    def out_of_bounds(self):
+        """
+        find the living bees that flew off the top or bottom of the screen
+        :return: bool array
+        """
+        return self.alive & ((self.y > 650) | (self.y < 50))
+
+    def collide(self, pipe):
+        """
+        find the living bees that hit a pipe
+        :param pipe: Pipe object
+        :return: bool array
+        """
+        return pipe.collide_all(self.img, self.x, self.y, self.tilt, self.alive, self.course)
+
+    def visible(self):
+        """
+        find the bees on screen: the living ones, only the ones on the first
+        course when they fly several, since that's the one the pipes show
+        :return: bool array
+        """
+        return self.alive if self.course is None else self.alive & (self.course == 0)
+
+    def detail(self, gaps = None):
+        """
+        choose which visible bees to draw. Given the gaps they fly at, and
+        more of them than TOP + SAMPLED, only those are drawn and the rest
+        go in the strip, so drawing takes the same time however many bees
+        there are. The bees still flying all have the same fitness, so the
+        TOP are the ones closest to the centre of their gap
+        :param gaps: array of the y of the centre of the gap each bee flies at next, None to draw every bee
+        :return: (bool array of the bees to draw, bool array of the bees in the strip)
+        """
+        shown = self.visible()
+        rest = np.zeros_like(shown)
+        if gaps is not None and np.count_nonzero(shown) > self.TOP + self.SAMPLED:
+            index = np.flatnonzero(shown)
+            offset = np.abs(self.y[index] + self.img.get_height() / 2 - gaps[index])
+            top = index[np.argpartition(offset, self.TOP)[:self.TOP]]
+            rest = shown.copy()
+            rest[top] = False
+            others = np.flatnonzero(rest)
+            sampled = others[np.argpartition(self.rank[others], self.SAMPLED)[:self.SAMPLED]]
+            rest[sampled] = False
+            shown = np.zeros_like(shown)
+            shown[top] = True
+            shown[sampled] = True
+        return shown, rest
+
+    def draw(self, window, gaps = None):
+        """
+        draw the visible bees, see detail()
+        :param window: pygame surface to draw the bees on
+        :param gaps: array of the y of the centre of the gap each bee flies at next, None to draw every bee
+        :return: Rect covering everything drawn, None if nothing was
+        """
+        shown, rest = self.detail(gaps)
+        rects = []
+        if rest.any():
+            rects.append(draw_strip(window, self.img, self.x, strip_counts(self.y[rest], self.img)))
+
+        rects.extend(blitRotateCenter(window, self.img, (self.x, y), tilt)
+                     for y, tilt in zip(self.y[shown].tolist(), self.tilt[shown].tolist()))
+        if not rects:
+            return None
+        return rects[0].unionall(rects)
+
+class Pipe():
+    """
+    represents a pair of pipes
+    """
+    GAP = 200
+    VEL = 6
+
+    def __init__(self, x, img, height):
+        """
+        initialize pipe object
+        :param x: int
+        :param img: pipe surface
+        :param height: height of the gap, from the top of the screen (int),
+                       or a list of the heights on each course when bees
+                       fly several courses at once
+        :return" None
+        """
+        self.x = x
+        self.height = 0
+
+        # where the top and bottom of the pipe is
+        self.top = 0
+        self.bottom = 0
+
+        self.LOWER_PIPE = flipped(img)
+        self.UPPER_PIPE = img
+
+        self.passed = False
+
+        self.set_height(height)
+
+    def set_height(self, height):
+        """
+        set the height of the pipe, from the top of the screen
+        :param height: int, or a list with the height on each course
+        :return: None
+        """
+        self.heights = np.atleast_1d(np.array(height, dtype = int))
+        self.tops = self.heights - self.UPPER_PIPE.get_height()
+        self.bottoms = self.heights + self.GAP
+
+        # the pipe on the first course is the one that is drawn
+        self.height = int(self.heights[0])
+        self.top = int(self.tops[0])
+        self.bottom = int(self.bottoms[0])
+
+    def move(self):
+        """
+        move pipe based on vel
+        :return: None
+        """
+        self.x -= self.VEL
+
+    def draw(self, win):
+        """
+        draw both the top and bottom of the pipe
+        :param win: pygame window/surface
+        :return: list of the Rects that were drawn on
+        """
+        # only the opaque part of each image needs drawing
+        upper_bounds = rotated_mask(self.UPPER_PIPE)[2]
+        lower_bounds = rotated_mask(self.LOWER_PIPE)[2]
+        # draw top
+        upper = win.blit(self.UPPER_PIPE, upper_bounds.move(self.x, self.top), upper_bounds)
+        # draw bottom
+        lower = win.blit(self.LOWER_PIPE, lower_bounds.move(self.x, self.bottom), lower_bounds)
+        return [upper, lower]
+
+
+    def collide(self, bee, win):
+        """
+        returns if a point is colliding with the pipe
+        :param bird: Bird object
+        :return: Bool
+        """
+        return bool(self.collide_all(bee.img, bee.x, np.array([bee.y]), np.array([bee.tilt]))[0])
+
+    def collide_all(self, img, x, ys, tilts, alive = None, course = None):
+        """
+        find which bees of a population are colliding with the pipe.
+        Only bees whose opaque pixels reach the pipe's columns and
+        rows get the pixel mask test
+        :param img: bee surface
+        :param x: x pos of the bees (int)
+        :param ys: array of y pos
+        :param tilts: array of tilts
+        :param alive: bool array of the bees to test, None for all of them
+        :param course: int array of the course each bee flies, None for the first
+        :return: bool array
+        """
+        hit = np.zeros(len(ys), dtype = bool)
+        if alive is None:
+            alive = np.ones(len(ys), dtype = bool)
+
+        # where the pipe's top and bottom are for each bee
+        tops = self.top if course is None else self.tops[course]
+        bottoms = self.bottom if course is None else self.bottoms[course]
+
+        upper_mask, _, upper_bounds = rotated_mask(self.UPPER_PIPE)
+        lower_mask, _, lower_bounds = rotated_mask(self.LOWER_PIPE)
+        upper_end = tops + upper_bounds.bottom # bottom of the upper pipe
+        lower_start = bottoms + lower_bounds.top # top of the lower pipe
+
+        ys = np.round(ys)
+        for angle in np.unique(tilts[alive]).tolist():
+            bee_mask, (dx, dy), bounds = rotated_mask(img, angle)
+
+            # the bee's opaque pixels are left or right of the pipe
+            if x + bounds.right <= self.x + upper_bounds.left or x + bounds.left >= self.x + upper_bounds.right:
+                continue
+
+            # skip the bees that are inside the gap
+            near = alive & (tilts == angle) & ((ys + bounds.top < upper_end) | (ys + bounds.bottom > lower_start))
+            bee_x = x + dx
+            for i in np.flatnonzero(near).tolist():
+                bee_y = int(ys[i]) + dy
+                k = 0 if course is None else course[i]
+                if bee_mask.overlap(upper_mask, (self.x - bee_x, int(self.tops[k]) - bee_y)) or \
+                    bee_mask.overlap(lower_mask, (self.x - bee_x, int(self.bottoms[k]) - bee_y)):
+                    hit[i] = True
+
+        return hit
+
+class Ground:
+    """
+    The ground of the game. Moves sideways
+    """
+    VEL = 6
+
+    def __init__(self, y, img):
+        """
+        Initialize the object
+        :param y: int
+        :return: None
+        """
+        self.y = y
+        self.x1 = 0
+        self.x2 = WIDTH
+        self.img = img
+
+    def move(self):
+        """
+        move floor so it looks like its scrolling
+        :return: None
+        """
+        self.x1 -= self.VEL
+        self.x2 -= self.VEL
+        if self.x1 + WIDTH< 0:
+            self.x1 = self.x2 + WIDTH
+
+        if self.x2 + WIDTH < 0:
+            self.x2 = self.x1 + WIDTH
+
+    def draw(self, win):
+        """
+        Draw the floor. This is two images that move together.
+        :param win: the pygame surface/window
+        :return: list of the Rects that were drawn on
+        """
+        return [win.blit(self.img, (self.x1, self.y)), win.blit(self.img, (self.x2, self.y))]
@@ -1,300 +1,206 @@
 import pygame
 import random
+import io
 import os
+import gzip
 import time
-import neat
-import visualize
+import argparse
+import configparser
+import numpy as np
 import pickle
+import game
+from batchnet import BatchNetwork
+from render import Renderer, label
+from cache import LRUCache, FitnessCache
+from writer import BackgroundWriter
+from profiler import FrameProfiler
+from game import WIDTH, HEIGHT, Bee, Pipe, Ground, Swarm, Course
 
-WIDTH = 500
-HEIGHT = 800
-FLOOR = 700
 BEST = 0
-
-pygame.init()
-
-FONT = pygame.font.SysFont("Avenir", 50)
-
-WINDOW = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Happy Bee!")
-
-sky_img = pygame.transform.scale(pygame.image.load(os.path.join("images","sky.png")).convert_alpha(), (500, 700))
-ground_img = pygame.transform.scale(pygame.image.load(os.path.join("images","ground.png")).convert_alpha(),(500, 100))
-pipe_img = pygame.transform.scale(pygame.image.load(os.path.join("images","pipe.png")).convert_alpha(), (400, 450))
-bee_img = pygame.transform.scale(pygame.image.load(os.path.join("images","bee.png")).convert_alpha(), (50, 50))
+HEADLESS = False # train without a window, frame cap or drawing
+SEED = None # seed for the pipe courses, None for random courses
+
+# settings from the [HappyBee] section of the config file
+FIXED_COURSE = False # fly the same course every generation
+COURSES = 1 # courses every genome flies each generation, all at once
+COURSE_AGGREGATE = "mean" # how a genome's fitness on the courses is combined: mean, min or a percentile like p25
+FITNESS_CACHE = FitnessCache(0) # fitness of genomes that already flew the fixed course
+COMPILE_CACHE = LRUCache(1000) # network Layouts of the topologies seen lately
+MAX_FRAMES = 0 # frames each generation may last, 0 for no limit
+MAX_SCORE = 0 # score each generation may reach, 0 for no limit
+MAX_SECONDS = 0 # seconds each generation may take, 0 for no limit
+STOP_AT_THRESHOLD = True # end a generation once a bee reaches fitness_threshold
+CHECKPOINT_GENERATIONS = 5 # generations between checkpoints, 0 for none
+CHECKPOINT_SECONDS = 0 # seconds between checkpoints, 0 for none
+CHECKPOINT_PREFIX = "happy-bee-checkpoint-" # the generation number is added to the end
+STATS_FILE = "happy-bee-stats.csv" # a line of statistics per generation, .jsonl for JSON lines
+MIGRATION_INTERVAL = 5 # generations between migrations when training on islands
+MIGRANTS = 2 # best genomes each island sends to the next one
+
+WRITER = BackgroundWriter() # writes best.pickle and the checkpoints off the training thread
+PROFILER = None # FrameProfiler timing the eval loop, None when not profiling
+ISLAND = None # connection to the main process, in the process of an island
+SNAPSHOT = None # Snapshot frames are published to, in the process training for watch_training
+CONTROL = None # connection STOP comes in on, in the process training for watch_training
+STOPPED = False # STOP was clicked: the generation ends where it is and run() stops after it
+FRAMES = 0 # frames the last simulate() lasted
+TIMED_OUT = False # the last simulate() was cut short by MAX_SECONDS
+SNAPSHOT_RATE = 30 # frames a second published to the Snapshot and drawn from it
+PUBLISHED = 0 # time.time() a frame was last published to SNAPSHOT, over every generation
+
+# training speeds: physics steps per drawn frame, None draws 20 times a
+# second of real time and simulates as fast as possible in between
+SPEEDS = [("1X", 1), ("5X", 5), ("MAX", None)]
+SPEED = 0 # which of SPEEDS visual training runs at
+
+WINDOW = None
+
+sky_img = None
+ground_img = None
+pipe_img = None
+bee_img = None
 
 gen = 0
 
-LAST_HEIGHT = 250
-
+# Determine path to configuration file. This path manipulation is
+# here so that the script will run successfully regardless of the
+# current working directory.
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'happy-bee-config.ini')
 
 
+def init_window():
+    """
+    open the game window and load the images for drawing
+    :return: None
+    """
+    global WINDOW, sky_img, ground_img, pipe_img, bee_img
+    pygame.init()
 
+    WINDOW = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Happy Bee!")
 
+    sky_img, ground_img, pipe_img, bee_img = game.load_images()
+    game.prerotate(bee_img)
 
+def init_headless():
+    """
+    load the images needed for the simulation without opening a window
+    :return: None
+    """
+    global sky_img, ground_img, pipe_img, bee_img
+    sky_img, ground_img, pipe_img, bee_img = game.load_images(convert = False)
+    game.prerotate(bee_img)
 
 def button_print(text, back_color, w, h, scale = 1):
-    font = pygame.font.SysFont("Avenir", int(scale * 70))
     color = (175,175,175)
     button_width = scale * len(text) * 50
     button_height = scale * 100
     dim = [w - 0.5 * button_width, h - 0.5 * button_height, button_width, button_height]
     pygame.draw.rect(WINDOW, back_color, dim)
 
-    label = font.render(text, 1, color)
-    WINDOW.blit(label, (w - 0.5 * label.get_width(), h - 0.2 * button_height))
-    pygame.display.update()
+    text_label = label(text, color, int(scale * 70))
+    WINDOW.blit(text_label, (w - 0.5 * text_label.get_width(), h - 0.2 * button_height))
     return dim
 
-def blitRotateCenter(surf, image, topleft, angle):
+def speed_print():
+    """
+    draw the training speed buttons under the STOP button,
+    the chosen speed in pink
+    :return: list of the buttons' dims
     """
-    Rotate a surface and blit it to the window
-    :param surf: the surface to blit to
-    :param image: the image surface to rotate
-    :param topLeft: the top left position of the image
-    :param angle: a float value for angle
+    buttons = []
+    x = 25
+    for i, (text, steps) in enumerate(SPEEDS):
+        color = (255,47,154) if i == SPEED else (155,75,160)
+        width = 0.5 * len(text) * 50
+        buttons.append(button_print(text, color, x + 0.5 * width, 95, 0.5))
+        x += width + 5
+    return buttons
+
+def train_labels(renderer, score, gen, alive, on_stop):
+    """
+    draw the score, generation and bees flying, and the STOP button
     :return: None
     """
-    rotated_image = pygame.transform.rotate(image, angle)
-    new_rect = rotated_image.get_rect(center = image.get_rect(topleft = topleft).center)
-
-    surf.blit(rotated_image, new_rect.topleft)
-
-def draw_window_train(win, bees, ground, pipes, score, gen, on_stop):
-    win.blit(sky_img, (0,0))
-    for pipe in pipes:
-        pipe.draw(win)
-
-    for bee in bees:
-        bee.draw(win)
-    ground.draw(win)
-    score_label = FONT.render("Score: " + str(score),1,(255,255,255))
-    win.blit(score_label, (WIDTH - score_label.get_width() - 15, 10))
-    gen_label = FONT.render("Gen: " + str(gen),1,(255,255,255))
-    win.blit(gen_label, (WIDTH - gen_label.get_width() - 15, 50))
-    pygame.display.update()
-    if on_stop:
-        button_print("STOP", (100,100,100), 75, 40, 0.5)
-    else:
-        button_print("STOP", (255,47,154), 75, 40, 0.5)
-
-def draw_window(win, bees, ground, pipes, score, on_stop):
-    win.blit(sky_img, (0,0))
-    for pipe in pipes:
-        pipe.draw(win)
-
-    for bee in bees:
-        bee.draw(win)
-    ground.draw(win)
-    score_label = FONT.render("Score: " + str(score),1,(255,255,255))
-    win.blit(score_label, (WIDTH - score_label.get_width() - 15, 10))
-    pygame.display.update()
+    win = renderer.win
+    score_label = label("Score: " + str(score), (255,255,255), 50)
+    renderer.add(win.blit(score_label, (WIDTH - score_label.get_width() - 15, 10)))
+    gen_label = label("Gen: " + str(gen), (255,255,255), 50)
+    renderer.add(win.blit(gen_label, (WIDTH - gen_label.get_width() - 15, 50)))
+    alive_label = label("Alive: " + str(alive), (255,255,255), 30)
+    renderer.add(win.blit(alive_label, (WIDTH - alive_label.get_width() - 15, 95)))
     if on_stop:
-        button_print("STOP", (100,100,100), 75, 40, 0.5)
+        renderer.add(button_print("STOP", (100,100,100), 75, 40, 0.5))
     else:
-        button_print("STOP", (255,47,154), 75, 40, 0.5)
-
-class Bee:
-    """
-    Bee object for Happy Bee
-    """
-    MAX_ROTATION = 25
-    ROT_VEL = 20
-
-    def __init__(self, x, y, img):
-        """
-        Initialize the object
-        :param x: starting x pos (int)
-        :param y: starting y pos (int)
-        :return: None
-        """
-        self.x = x
-        self.y = y
-        self.tilt = 0  # degrees to tilt
-        self.tick_count = 0 # time since last flap
-        self.vel = 0 # downward velocity (positive is downward)
-        self.img = img
-
-    def flap(self):
-        """
-        flap the bee upward
-        :return: None
-        """
-        self.vel = -10 
-        self.tick_count = 0
-
-    def move(self):
-        """
-        move the bee
-        :return: None
-        """
-        self.tick_count += 1
-
-        vert_displacement = self.vel*(self.tick_count) + 0.5*(3)*(self.tick_count)**2  # calculate displacement
-
-        # terminal velocity
-        if vert_displacement >= 16:
-            vert_displacement = (vert_displacement/abs(vert_displacement)) * 16
-
-        elif vert_displacement < 0:
-            vert_displacement -= 1
-
-        self.y = self.y + vert_displacement
-
-        #if vert_displacement < 0 or self.y < self.height + 50:  # tilt up
-        if vert_displacement < 0: # tilt up
-            if self.tilt < self.MAX_ROTATION:
-                self.tilt = self.MAX_ROTATION
-        else:  # tilt down
-            if self.tilt > -90:
-                self.tilt -= self.ROT_VEL
-
-    def get_mask(self):
-        """
-        get the mask for the bee
-        :return: None
-        """
-        return pygame.mask.from_surface(self.img)
+        renderer.add(button_print("STOP", (255,47,154), 75, 40, 0.5))
 
-    def draw(self, window):
-        """
-        draw the bee
-        :param window: pygame surface to draw the bee on
-        :return: None
-        """
-
-        # tilt the bird
-        blitRotateCenter(window, self.img, (self.x, self.y), self.tilt)
-
-class Pipe():
+def draw_window_train(renderer, bees, ground, pipes, score, gen, on_stop, gaps = None):
     """
-    represents a pair of pipes
+    draw a frame of training
+    :param gaps: list with the centre of the gap each Swarm's bees fly
+                 at next, so only the ones lined up best and a sample are
+                 drawn when there are lots of them, None to draw every bee
     """
-    GAP = 200
-    VEL = 6
-
-    def __init__(self, x):
-        """
-        initialize pipe object
-        :param x: int
-        :param y: int
-        :return" None
-        """
-        self.x = x
-        self.height = 0
-
-        # where the top and bottom of the pipe is
-        self.top = 0
-        self.bottom = 0
-
-        self.LOWER_PIPE = pygame.transform.flip(pipe_img, False, True)
-        self.UPPER_PIPE = pipe_img
-
-        self.passed = False
-
-        self.set_height()
-
-    def set_height(self):
-        """
-        set the height of the pipe, from the top of the screen
-        :return: None
-        """
-        global LAST_HEIGHT
-        self.height = LAST_HEIGHT + random.randrange(-250, 250)
-        if self.height < 75:
-            self.height = random.randrange(75, 125)
-        if self.height > 425:
-            self.height = random.randrange(375, 425)
-        LAST_HEIGHT = self.height
-        #self.height = random.randrange(75, 425)
-        self.top = self.height - self.UPPER_PIPE.get_height()
-        self.bottom = self.height + self.GAP
-
-    def move(self):
-        """
-        move pipe based on vel
-        :return: None
-        """
-        self.x -= self.VEL
-
-    def draw(self, win):
-        """
-        draw both the top and bottom of the pipe
-        :param win: pygame window/surface
-        :return: None
-        """
-        # draw top
-        win.blit(self.UPPER_PIPE, (self.x, self.top))
-        # draw bottom
-        win.blit(self.LOWER_PIPE, (self.x, self.bottom))
-
-
-    def collide(self, bee, win):
-        """
-        returns if a point is colliding with the pipe
-        :param bird: Bird object
-        :return: Bool
-        """
-        bee_mask = bee.get_mask()
-        upper_mask = pygame.mask.from_surface(self.UPPER_PIPE)
-        lower_mask = pygame.mask.from_surface(self.LOWER_PIPE)
-        upper_offset = (self.x - bee.x, self.top - round(bee.y))
-        lower_offset = (self.x - bee.x, self.bottom - round(bee.y))
-
-        upper_overlap = bee_mask.overlap(upper_mask, upper_offset)
-        lower_overlap = bee_mask.overlap(lower_mask, lower_offset)
-
-        if upper_overlap or lower_overlap:
-            return True
+    win = renderer.win
+    renderer.begin_frame()
+    for pipe in pipes:
+        renderer.add(pipe.draw(win))
 
-        return False
+    for i, bee in enumerate(bees):
+        renderer.add(bee.draw(win, None if gaps is None else gaps[i]))
+    renderer.add(ground.draw(win))
+    train_labels(renderer, score, gen, sum(np.count_nonzero(bee.visible()) for bee in bees), on_stop)
+    renderer.add(speed_print())
+    renderer.end_frame()
 
-class Ground:
+def draw_window_snapshot(renderer, frame, ground, pipes, on_stop):
     """
-    The ground of the game. Moves sideways
+    draw a frame published by the training process
+    :param frame: the snapshot.Frame to draw
+    :param pipes: Pipes placed where the frame's are
     """
-    VEL = 6
-
-    def __init__(self, y, img):
-        """
-        Initialize the object
-        :param y: int
-        :return: None
-        """
-        self.y = y
-        self.x1 = 0
-        self.x2 = WIDTH
-        self.img = img
-
-    def move(self):
-        """
-        move floor so it looks like its scrolling
-        :return: None
-        """
-        self.x1 -= self.VEL
-        self.x2 -= self.VEL
-        if self.x1 + WIDTH< 0:
-            self.x1 = self.x2 + WIDTH
-
-        if self.x2 + WIDTH < 0:
-            self.x2 = self.x1 + WIDTH
+    win = renderer.win
+    renderer.begin_frame()
+    for pipe in pipes:
+        renderer.add(pipe.draw(win))
+
+    if frame.strip.any():
+        renderer.add(game.draw_strip(win, bee_img, frame.x, frame.strip.astype(int)))
+    count = frame.count
+    for y, tilt in zip(frame.ys[:count].tolist(), frame.tilts[:count].tolist()):
+        renderer.add(game.blitRotateCenter(win, bee_img, (frame.x, y), tilt))
+    renderer.add(ground.draw(win))
+    train_labels(renderer, frame.score, frame.gen, frame.alive, on_stop)
+    renderer.end_frame()
+
+def draw_window(renderer, bees, ground, pipes, score, on_stop, lines = ()):
+    win = renderer.win
+    renderer.begin_frame()
+    for pipe in pipes:
+        renderer.add(pipe.draw(win))
 
-    def draw(self, win):
-        """
-        Draw the floor. This is two images that move together.
-        :param win: the pygame surface/window
-        :return: None
-        """
-        win.blit(self.img, (self.x1, self.y))
-        win.blit(self.img, (self.x2, self.y))
+    for bee in bees:
+        renderer.add(bee.draw(win))
+    for start, end in lines:
+        renderer.add(pygame.draw.line(win, (255, 0, 0), start, end, 2))
+    renderer.add(ground.draw(win))
+    score_label = label("Score: " + str(score), (255,255,255), 50)
+    renderer.add(win.blit(score_label, (WIDTH - score_label.get_width() - 15, 10)))
+    if on_stop:
+        renderer.add(button_print("STOP", (100,100,100), 75, 40, 0.5))
+    else:
+        renderer.add(button_print("STOP", (255,47,154), 75, 40, 0.5))
+    renderer.end_frame()
 
 def play():
     bees = [Bee(230,350, bee_img)]
     ground = Ground(700, ground_img)
-    pipes = [Pipe(700)]
+    course = Course()
+    pipes = [Pipe(700, pipe_img, course[0])]
     clock = pygame.time.Clock()
     score = 0
 
+    renderer = Renderer(WINDOW, sky_img)
     stop_button = button_print("STOP", (255,47,154), 75, 40, 0.5)
     on_stop = False
     while(1):
@@ -323,7 +229,7 @@ def play():
             if add_pipe:
                 score += 1
                 # can add this line to give more reward for passing through a pipe (not required)
-                pipes.append(Pipe(WIDTH - 150))
+                pipes.append(Pipe(WIDTH - 150, pipe_img, course[score]))
             
             if (bee.y > 650):
                 bees.pop(bees.index(bee))
@@ -351,80 +257,311 @@ def play():
                     stop_button[1] < mouse[1] < stop_button[1] + stop_button[3]:
                         return;
 
-        draw_window(WINDOW, bees, ground, pipes, score, on_stop)
+        draw_window(renderer, bees, ground, pipes, score, on_stop)
 
 
 
-def eval_genomes(genomes, config):
+def save_best(genome, config, score):
     """
-    take a genome and run the bees in the simulation
-    until they are all dead, then evaluate their 
-    fitness based on how far they got
+    save the net of a bee that beat the best score so far, pickled
+    to best.pickle and exported as a model to best.npz
+    :param genome: the bee's genome
+    :param config: NEAT config
+    :param score: the score the bee reached
+    :return: None
     """
-    global gen, WINDOW, BEST
-    gen += 1
+    global BEST
+    if score > 20 and score > BEST:
+        BEST = score
+        if ISLAND is not None:
+            # the main process saves the best bee of all the islands
+            ISLAND.send(("best", score, genome))
+            return
+        import neat
+        net = neat.nn.FeedForwardNetwork.create(genome, config)
+        WRITER.write("best.pickle", pickle.dumps(net))
+        model = io.BytesIO()
+        BatchNetwork([net]).save(model)
+        WRITER.write("best.npz", model.getvalue())
+
+def load_model(model_name):
+    """
+    load the net for watch(), either an exported .npz model
+    (which needs neither neat nor pickle) or a pickled neat net
+    :param model_name: file name
+    :return: BatchNetwork with the one net
+    """
+    if model_name.endswith(".npz"):
+        return BatchNetwork.load(model_name)
+    with open(model_name, "rb") as file:
+        return BatchNetwork([pickle.load(file)])
+
+def export(pickle_name, model_name):
+    """
+    export a pickled neat net, like a best.pickle saved before
+    training exported models, to an .npz model
+    :param pickle_name: the pickled net
+    :param model_name: the model file to write
+    :return: None
+    """
+    load_model(pickle_name).save(model_name)
+
+def course_seed():
+    """
+    seed for this generation's pipe course, every bee in the generation
+    (and every worker process) flies the same course
+    :return: int
+    """
+    if FIXED_COURSE:
+        return SEED
+    if SEED is None:
+        return random.randrange(2 ** 32)
+    return SEED + gen
 
-    bees = [] # a list of bees for the current generation
-    neural_nets = [] # a list of each bee's neural net
-    genomes_dynamic = [] # a changing list of the genomes
+def generation_courses(seed):
+    """
+    the pipe courses a generation flies: the one from its seed, and
+    COURSES - 1 more from a bank made with the same seed
+    :param seed: seed for the generation's courses
+    :return: list of Course
+    """
+    return [Course(seed)] + Course.bank(seed, COURSES - 1)
 
+def aggregate(fitness):
+    """
+    combine each genome's fitness on the courses it flew into one,
+    the way COURSE_AGGREGATE says
+    :param fitness: array of shape (courses, genomes)
+    :return: array of shape (genomes,)
+    """
+    if COURSE_AGGREGATE == "mean":
+        return fitness.mean(axis = 0)
+    if COURSE_AGGREGATE == "min":
+        return fitness.min(axis = 0)
+    return np.percentile(fitness, float(COURSE_AGGREGATE[1:]), axis = 0)
 
+def load_settings(config_file):
+    """
+    read the training settings from the [HappyBee] section of the config file
+    :param config_file: location of config file
+    :return: None
+    """
+    global FIXED_COURSE, COURSES, COURSE_AGGREGATE, FITNESS_CACHE, COMPILE_CACHE, MAX_FRAMES, MAX_SCORE, MAX_SECONDS, STOP_AT_THRESHOLD
+    global CHECKPOINT_GENERATIONS, CHECKPOINT_SECONDS, CHECKPOINT_PREFIX, STATS_FILE, MIGRATION_INTERVAL, MIGRANTS
+    settings = configparser.ConfigParser()
+    settings.read(config_file)
+    FIXED_COURSE = settings.getboolean("HappyBee", "fixed_course", fallback = False)
+    COURSES = max(1, settings.getint("HappyBee", "courses", fallback = 1))
+    COURSE_AGGREGATE = settings.get("HappyBee", "course_aggregate", fallback = "mean").strip().lower()
+    if COURSE_AGGREGATE not in ("mean", "min"):
+        try:
+            if not (COURSE_AGGREGATE.startswith("p") and 0 <= float(COURSE_AGGREGATE[1:]) <= 100):
+                raise ValueError
+        except ValueError:
+            raise ValueError("course_aggregate must be mean, min or a percentile like p25, not {0}".format(COURSE_AGGREGATE))
+    MAX_FRAMES = settings.getint("HappyBee", "max_frames", fallback = 0)
+    MAX_SCORE = settings.getint("HappyBee", "max_score", fallback = 0)
+    MAX_SECONDS = settings.getfloat("HappyBee", "max_seconds", fallback = 0)
+    STOP_AT_THRESHOLD = settings.getboolean("HappyBee", "stop_at_threshold", fallback = True)
+    # a genome's fitness can only be reused on a course it has flown before
+    cache_size = settings.getint("HappyBee", "fitness_cache_size", fallback = 1000)
+    FITNESS_CACHE = FitnessCache(cache_size if FIXED_COURSE else 0)
+    COMPILE_CACHE = LRUCache(settings.getint("HappyBee", "compile_cache_size", fallback = 1000))
+    CHECKPOINT_GENERATIONS = settings.getint("HappyBee", "checkpoint_generations", fallback = 5)
+    CHECKPOINT_SECONDS = settings.getfloat("HappyBee", "checkpoint_seconds", fallback = 0)
+    CHECKPOINT_PREFIX = settings.get("HappyBee", "checkpoint_prefix", fallback = "happy-bee-checkpoint-")
+    STATS_FILE = settings.get("HappyBee", "stats_file", fallback = "happy-bee-stats.csv")
+    MIGRATION_INTERVAL = settings.getint("HappyBee", "migration_interval", fallback = 5)
+    MIGRANTS = settings.getint("HappyBee", "migrants", fallback = 2)
+
+def checkpoint_state():
+    """
+    the training state outside the neat population that a checkpoint
+    needs to carry on where it left off
+    :return: dict
+    """
+    return {"gen": gen, "best": BEST, "seed": SEED}
+
+def over_limit(frame, score, start, fitness, config, frames = 0):
+    """
+    check whether a generation has hit one of its limits
+    :param frame: frames simulated so far
+    :param score: pipes passed so far
+    :param start: time.time() when the generation started
+    :param fitness: array of the fitness of the genomes still flying
+    :param config: NEAT config
+    :param frames: frame the generation is known to end at, 0 if it isn't known
+    :return: Bool
+    """
+    if frames:
+        # flying again up to where the generation ended, no other limit applies
+        return frame >= frames
+    if MAX_FRAMES and frame >= MAX_FRAMES:
+        return True
+    if MAX_SCORE and score >= MAX_SCORE:
+        return True
+    if MAX_SECONDS and time.time() - start >= MAX_SECONDS:
+        return True
+    if STOP_AT_THRESHOLD and not config.no_fitness_termination and \
+        len(fitness) > 0 and fitness.max() >= config.fitness_threshold:
+        return True
+    return False
+
+def cached_fitness(genomes, seed):
+    """
+    give the genomes that already flew this generation's courses their
+    fitness from FITNESS_CACHE, so they don't have to fly them again
+    :param genomes: list of (genome_id, genome)
+    :param seed: seed of the generation's courses
+    :return: (list of (genome_id, genome) that still have to fly, their cache keys)
+    """
+    todo = []
+    keys = []
+    # the fitness also depends on how many courses there are and how it's combined
+    course_id = seed if COURSES == 1 else (seed, COURSES, COURSE_AGGREGATE)
     for genome_id, genome in genomes:
-        genome.fitness = 0 
-        net = neat.nn.FeedForwardNetwork.create(genome, config)
-        neural_nets.append(net)
-        bees.append(Bee(230,350, bee_img))
-        genomes_dynamic.append(genome)
+        key = FITNESS_CACHE.key(genome, course_id)
+        fitness = FITNESS_CACHE.get(key)
+        if fitness is None:
+            todo.append((genome_id, genome))
+            keys.append(key)
+        else:
+            genome.fitness = fitness
+    return todo, keys
+
+def publish(bees, gaps, pipes, score):
+    """
+    write the bees and pipes to SNAPSHOT for watch_training to draw,
+    only the bees it would draw one by one and the strip of the rest
+    :param bees: the Swarm
+    :param gaps: array of the centre of the gap each bee flies at next
+    :param pipes: list of Pipes
+    :param score: pipes passed
+    :return: None
+    """
+    shown, rest = bees.detail(gaps)
+    SNAPSHOT.write(gen, score, np.count_nonzero(bees.visible()), bees.x, bees.y[shown], bees.tilt[shown],
+                   [pipe.x for pipe in pipes], [pipe.height for pipe in pipes],
+                   game.strip_counts(bees.y[rest], bee_img))
 
+def stop_requested():
+    """
+    whether STOP was clicked, taking a "stop" from watch_training's
+    window off CONTROL first when training for it
+    :return: bool
+    """
+    global STOPPED
+    if CONTROL is not None and CONTROL.poll() and CONTROL.recv() == "stop":
+        STOPPED = True
+    return STOPPED
+
+def simulate(genomes, config, courses, start = None, frames = 0):
+    """
+    run a bee for each genome on each pipe course until they are all
+    dead, adding to their fitness based on how far they got. The
+    courses are flown at once: the pipes move together and only their
+    heights differ, so every bee is updated, asked for its flap and
+    checked for collisions in the same pass each frame
+    :param genomes: list of (genome_id, genome)
+    :param config: NEAT config
+    :param courses: list of the pipe Courses to fly
+    :param start: time.time() when the generation started, None for now
+    :param frames: frame the generation is known to end at, 0 if it isn't known
+    :return: list of the score each genome had when it died, on its worst course
+    """
+    global SPEED, STOPPED, FRAMES, TIMED_OUT, PUBLISHED
+    prof = PROFILER
+    if prof is not None:
+        t = time.perf_counter()
+
+    # bee k * n + i is genome i on course k, and every bee's
+    # neural net is activated all at once
+    n = len(genomes)
+    k = len(courses)
+    FRAMES = 0
+    TIMED_OUT = False
+    if n == 0:
+        return []
+    neural_nets = BatchNetwork.create([genome for genome_id, genome in genomes], config, COMPILE_CACHE).repeat(k)
+
+    course = np.repeat(np.arange(k), n)
+    bees = Swarm(n * k, 230, 350, bee_img, course)
+    fitness = np.zeros(n * k)
+    scores = np.zeros(n * k, dtype = int)
 
     ground = Ground(700, ground_img)
-    pipes = [Pipe(500)]
+    pipes = [Pipe(500, pipe_img, [c[0] for c in courses])]
     clock = pygame.time.Clock()
     score = 0
 
-    stop_button = button_print("STOP", (255,47,154), 75, 40, 0.5)
+    if not HEADLESS:
+        renderer = Renderer(WINDOW, sky_img)
+        stop_button = button_print("STOP", (255,47,154), 75, 40, 0.5)
+        speed_buttons = speed_print()
     on_stop = False
+    frame = 0
+    last_draw = time.time()
+    if start is None:
+        start = last_draw
+    if prof is not None:
+        t = prof.lap("setup", t)
     while(1):
-        
-        clock.tick(20)
+        if STOPPED:
+            # the bees still flying keep what they have earned so far
+            scores[bees.alive] = score
+            break
+
+        # only some frames get drawn (and checked for clicks) when sped up
+        steps = SPEEDS[SPEED][1]
+        if HEADLESS:
+            draw = False
+        elif steps is None:
+            draw = time.time() - last_draw >= 1 / 20
+        else:
+            draw = frame % steps == 0
+        frame += 1
+
+        if draw and steps is not None:
+            clock.tick(20)
+        if prof is not None:
+            t = prof.lap("wait", t)
+            prof.count("frames")
         ground.move()
 
-        pipe_num = 0 # Which set of pipes the bees should look at 
-        if len(pipes) > 1 and bees[0].x > pipes[0].x + pipes[0].UPPER_PIPE.get_width()/2 - 50: 
+        pipe_num = 0 # Which set of pipes the bees should look at
+        if len(pipes) > 1 and bees.x > pipes[0].x + pipes[0].UPPER_PIPE.get_width()/2 - 50:
             pipe_num = 1  # If the first pipe is passed, the bees should look at the second
 
-        for i, bee in enumerate(bees):
-            genomes_dynamic[i].fitness += 0.1
-            action = neural_nets[i].activate((bee.y, bee.y - pipes[pipe_num].height, bee.y - pipes[pipe_num].bottom))
-
-            if action[0] > 0.75:  # used sigmoid, so try .75 as threashold for flap or not
-                bee.flap()
-            bee.move()
-
-            pipes_to_remove = []
-            add_pipe = False
-
-            if (bee.y > 650 or bee.y < 50):
-                if score > 20 and score > BEST:
-                    BEST = score
-                    pickle.dump(neural_nets[i],open("best.pickle", "wb"))
-                genomes_dynamic.pop(i)
-                neural_nets.pop(i)
-                bees.pop(i)
-                continue
-
-            for pipe in pipes:
-                # check for collision
-                if pipe.collide(bee, WINDOW):
-                    if score > 20 and score > BEST:
-                        BEST = score
-                        pickle.dump(neural_nets[i],open("best.pickle", "wb"))
-                    genomes_dynamic.pop(i)
-                    neural_nets.pop(i)
-                    bees.pop(i)
-                    break
+        pipes_to_remove = []
+        add_pipe = False
 
-        if (len(bees) == 0):
+        fitness[bees.alive] += 0.1
+        ys = bees.y
+        ahead = pipes[pipe_num]
+        actions = neural_nets.activate(np.column_stack((ys, ys - ahead.heights[course], ys - ahead.bottoms[course])))
+        flapping = bees.alive & (actions[:, 0] > 0.75)  # used sigmoid, so try .75 as threashold for flap or not
+        if prof is not None:
+            t = prof.lap("network", t)
+
+        bees.flap(flapping)
+        bees.move()
+        if prof is not None:
+            t = prof.lap("move", t)
+            prof.count("bee_steps", np.count_nonzero(bees.alive))
+
+        dead = bees.out_of_bounds()
+        bees.alive &= ~dead
+        for pipe in pipes:
+            # check for collision
+            if prof is not None:
+                prof.count("collision_tests", np.count_nonzero(bees.alive))
+            dead |= bees.collide(pipe)
+            bees.alive &= ~dead
+        scores[dead] = score
+        if prof is not None:
+            t = prof.lap("collide", t)
+
+        if not bees.alive.any():
             break
 
         for pipe in pipes:
@@ -432,7 +569,7 @@ def eval_genomes(genomes, config):
             if pipe.x + pipe.UPPER_PIPE.get_width() - 150 < 0:
                 pipes_to_remove.append(pipe)
 
-            if not pipe.passed and (pipe.x + pipe.UPPER_PIPE.get_width()/2 - 50) < bees[0].x:
+            if not pipe.passed and (pipe.x + pipe.UPPER_PIPE.get_width()/2 - 50) < bees.x:
                 pipe.passed = True
                 add_pipe = True
 
@@ -442,17 +579,46 @@ def eval_genomes(genomes, config):
         if add_pipe:
             score += 1
             # can add this line to give more reward for passing through a pipe (not required)
-            pipes.append(Pipe(WIDTH - 150))
-        
-            for genome in genomes_dynamic:
-                genome.fitness += 5
-        
+            pipes.append(Pipe(WIDTH - 150, pipe_img, [c[score] for c in courses]))
+
+            fitness[bees.alive] += 5
+
+        if k == 1:
+            flying = fitness[bees.alive]
+        else:
+            flying = aggregate(fitness.reshape(k, n))[bees.alive.reshape(k, n).any(axis = 0)]
+        if over_limit(frame, score, start, flying, config, frames):
+            # the bees still flying keep what they have earned so far
+            scores[bees.alive] = score
+            TIMED_OUT = not frames and MAX_SECONDS and time.time() - start >= MAX_SECONDS
+            break
+        if prof is not None:
+            t = prof.lap("pipes", t)
+
+        if SNAPSHOT is not None and time.time() - PUBLISHED >= 1 / SNAPSHOT_RATE:
+            # training for watch_training, which never waits for it. The
+            # time carries over, so generations shorter than a frame still show
+            PUBLISHED = time.time()
+            publish(bees, ahead.heights[course] + Pipe.GAP / 2, pipes, score)
+            stop_requested()
+
+        if not draw:
+            continue
+        last_draw = time.time()
+
         mouse = pygame.mouse.get_pos()
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 quit()
                 break
+            if event.type == pygame.KEYDOWN and pygame.K_1 <= event.key < pygame.K_1 + len(SPEEDS):
+                SPEED = event.key - pygame.K_1
+            if event.type == pygame.MOUSEBUTTONDOWN:
+                for i, button in enumerate(speed_buttons):
+                    if button[0] < mouse[0] < button[0] + button[2] and \
+                        button[1] < mouse[1] < button[1] + button[3]:
+                        SPEED = i
             if stop_button[0] < mouse[0] < stop_button[0] + stop_button[2] and \
                 stop_button[1] < mouse[1] < stop_button[1] + stop_button[3]:
                 on_stop = True
@@ -461,24 +627,158 @@ def eval_genomes(genomes, config):
             if pygame.mouse.get_pressed()[0]:
                 if stop_button[0] < mouse[0] < stop_button[0] + stop_button[2] and \
                     stop_button[1] < mouse[1] < stop_button[1] + stop_button[3]:
-                        if len(genomes_dynamic) > 0:
-                            genomes_dynamic[0].fitness = 1001
-                        return;
+                        STOPPED = True
+        if prof is not None:
+            t = prof.lap("events", t)
+
+        draw_window_train(renderer, [bees], ground, pipes, score, gen, on_stop, [ahead.heights[course] + Pipe.GAP / 2])
+        if prof is not None:
+            t = prof.lap("draw", t)
+            prof.count("renders")
+
+    FRAMES = frame
+    for (genome_id, genome), f in zip(genomes, aggregate(fitness.reshape(k, n)).tolist()):
+        genome.fitness = f
+    return scores.reshape(k, n).min(axis = 0).tolist()
+
+def eval_genomes(genomes, config):
+    """
+    take a genome and run the bees in the simulation
+    until they are all dead, then evaluate their
+    fitness based on how far they got
+    """
+    global gen
+    gen += 1
+
+    seed = course_seed()
+    courses = generation_courses(seed)
+    if not HEADLESS:
+        # watching training shows every bee, none come from the cache
+        for (genome_id, genome), score in zip(genomes, simulate(genomes, config, courses)):
+            save_best(genome, config, score)
+        return
+
+    genomes, keys = cached_fitness(genomes, seed)
+    if not genomes:
+        return # every genome already flew this course
+    scores = simulate(genomes, config, courses)
+    for (genome_id, genome), key, score in zip(genomes, keys, scores):
+        if not STOPPED and not TIMED_OUT:
+            # fitness cut short by STOP or the clock depends on when that happened
+            FITNESS_CACHE.put(key, genome.fitness)
+        save_best(genome, config, score)
+
+def init_worker(config_file):
+    """
+    set up a ParallelEvaluator worker process for headless training
+    :param config_file: location of config file
+    :return: None
+    """
+    global HEADLESS
+    HEADLESS = True
+    init_headless()
+    load_settings(config_file)
 
-        draw_window_train(WINDOW, bees, ground, pipes, score, gen, on_stop)
+def eval_chunk(genomes, config, seed, start, frames = 0):
+    """
+    fly a share of a generation's genomes on its pipe courses without a
+    window. This is what each worker process of ParallelEvaluator runs.
+    :param genomes: list of genomes
+    :param config: NEAT config
+    :param seed: seed for the generation's pipe courses
+    :param start: time.time() when the generation started, so max_seconds is for the whole generation
+    :param frames: frame the generation is known to end at, 0 if it isn't known
+    :return: (list of fitness, list of scores, frames flown, whether max_seconds cut it short)
+    """
+    scores = simulate([(None, genome) for genome in genomes], config, generation_courses(seed), start, frames)
+    return [genome.fitness for genome in genomes], scores, FRAMES, TIMED_OUT
+
+class ParallelEvaluator:
+    """
+    evaluates a generation across several processes, each flying a share
+    of the genomes together on its own copy of the generation's pipe
+    courses, so the fitness matches eval_genomes. It works like
+    neat.ParallelEvaluator but doesn't subclass it, so that neat is only
+    imported when training
+    """
+
+    def __init__(self, num_workers, config_file, timeout = None):
+        """
+        :param num_workers: number of worker processes
+        :param config_file: location of config file, for the workers' settings
+        :param timeout: seconds to wait for each share of a generation, None for no limit
+        :return: None
+        """
+        import multiprocessing
+        self.num_workers = num_workers
+        self.eval_function = eval_chunk
+        self.timeout = timeout
+        self.pool = multiprocessing.Pool(num_workers, init_worker, (config_file,))
+
+    def __del__(self):
+        self.pool.close()
+        self.pool.join()
+
+    def evaluate(self, genomes, config):
+        """
+        evaluate the genomes in the worker processes and set their fitness
+        :param genomes: list of (genome_id, genome)
+        :param config: NEAT config
+        :return: None
+        """
+        global gen
+        gen += 1
+
+        seed = course_seed()
+        start = time.time()
+        genomes, keys = cached_fitness(genomes, seed)
+        if not genomes:
+            return # every genome already flew this course
+        size = -(-len(genomes) // self.num_workers)
+        chunks = [[genome for genome_id, genome in genomes[i:i + size]] for i in range(0, len(genomes), size)]
+        results = self.fly(chunks, config, seed, start)
+
+        if STOP_AT_THRESHOLD and not config.no_fitness_termination:
+            # the generation ends at the first frame any bee reaches the
+            # threshold, so the shares that flew on past it fly again up to it
+            reached = [frames for fitness, scores, frames, timed_out in results
+                       if max(fitness) >= config.fitness_threshold]
+            if reached:
+                end = min(reached)
+                again = [i for i, result in enumerate(results) if result[2] > end]
+                for i, result in zip(again, self.fly([chunks[i] for i in again], config, seed, start, end)):
+                    results[i] = result
+
+        fitness = [f for result in results for f in result[0]]
+        scores = [score for result in results for score in result[1]]
+        timed_out = any(result[3] for result in results)
+        for (genome_id, genome), key, f, score in zip(genomes, keys, fitness, scores):
+            genome.fitness = f
+            if not timed_out:
+                FITNESS_CACHE.put(key, genome.fitness)
+            save_best(genome, config, score)
+
+    def fly(self, chunks, config, seed, start, frames = 0):
+        """
+        fly each share of the genomes in a worker process
+        :param chunks: list of lists of genomes
+        :return: the eval_chunk result of each share
+        """
+        jobs = [self.pool.apply_async(self.eval_function, (chunk, config, seed, start, frames)) for chunk in chunks]
+        return [job.get(timeout = self.timeout) for job in jobs]
 
-def watch(pickle_name):
-    file = open(pickle_name, 'rb')
-    net = pickle.load(file)
-    file.close()
+def watch(model_name):
+    net = load_model(model_name)
 
     bee = Bee(230,350, bee_img)
     ground = Ground(700, ground_img)
-    pipes = [Pipe(700)]
+    course = Course()
+    pipes = [Pipe(700, pipe_img, course[0])]
     clock = pygame.time.Clock()
     score = 0
     run = True
 
+    renderer = Renderer(WINDOW, sky_img)
     stop_button = button_print("STOP", (255,47,154), 75, 40, 0.5)
     on_stop = False
     while(run):
@@ -487,13 +787,12 @@ def watch(pickle_name):
         if len(pipes) > 1 and bee.x > pipes[0].x + pipes[0].UPPER_PIPE.get_width()/2 + 25: 
             pipe_num = 1  # If the first pipe is passed, the bees should look at the second
         
-        pygame.draw.line(WINDOW,(255, 0, 0),(bee.x + 40,bee.y + 25),
-            (pipes[pipe_num].x + pipes[0].UPPER_PIPE.get_width()/2, pipes[pipe_num].height), 2)
-        pygame.draw.line(WINDOW,(255, 0, 0),(bee.x + 40,bee.y + 25),
-            (pipes[pipe_num].x + pipes[0].UPPER_PIPE.get_width()/2, pipes[pipe_num].bottom), 2)
-        pygame.display.update()
+        lines = [((bee.x + 40,bee.y + 25),
+            (pipes[pipe_num].x + pipes[0].UPPER_PIPE.get_width()/2, pipes[pipe_num].height)),
+            ((bee.x + 40,bee.y + 25),
+            (pipes[pipe_num].x + pipes[0].UPPER_PIPE.get_width()/2, pipes[pipe_num].bottom))]
 
-        action = net.activate((bee.y, bee.y - pipes[pipe_num].height, bee.y - pipes[pipe_num].bottom))
+        action = net.activate(np.array([(bee.y, bee.y - pipes[pipe_num].height, bee.y - pipes[pipe_num].bottom)]))[0]
 
         if action[0] > 0.75:  # used sigmoid, so try .75 as threashold for flap or not
             bee.flap()
@@ -525,7 +824,7 @@ def watch(pickle_name):
         if add_pipe:
             score += 1
             # can add this line to give more reward for passing through a pipe (not required)
-            pipes.append(Pipe(WIDTH - 150))
+            pipes.append(Pipe(WIDTH - 150, pipe_img, course[score]))
         
         if (bee.y > 650 or bee.y < 50):
             break
@@ -546,112 +845,445 @@ def watch(pickle_name):
                     stop_button[1] < mouse[1] < stop_button[1] + stop_button[3]:
                         return;
 
-        draw_window(WINDOW, [bee], ground, pipes, score, on_stop)
+        draw_window(renderer, [bee], ground, pipes, score, on_stop, lines)
 
 
 
-def run(config_file):
+def run(config_file, headless = False, seed = None, workers = 1, resume = None, profile = None, generations = 50):
     """
     runs the NEAT algorithm to train a neural network to play flappy bird.
     :param config_file: location of config file
-    :return: None
+    :param headless: train without a window, frame cap or drawing
+    :param seed: seed for the pipe course, so runs can be repeated
+    :param workers: number of processes evaluating genomes, 0 for one per core
+    :param resume: checkpoint to carry on from, "latest" for the newest one
+    :param profile: CSV or JSON lines file to export frame timings to, None to not profile
+    :param generations: generations to train for in all, counting any before the checkpoint
+    :return: the neat.Population, at the generation training stopped
     """
-    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
-                         neat.DefaultSpeciesSet, neat.DefaultStagnation,
-                         config_file)
+    import neat
+    import multiprocessing
+    from checkpoint import Checkpointer
+    from reporters import CacheReporter, ProfileReporter, StatsWriter, StopReporter, TrainingStopped
+    from speciation import BatchSpeciesSet
+
+    global HEADLESS, SEED, BEST, PROFILER, STOPPED, gen
+    HEADLESS = headless
+    SEED = seed
+    STOPPED = False
+    load_settings(config_file)
+
+    if resume == "latest":
+        resume = Checkpointer.latest(CHECKPOINT_PREFIX)
+        if resume is None:
+            print("No checkpoints to resume from, starting a new run")
+
+    if resume is not None:
+        # the checkpoint has the config, random state and seed the run started with
+        print("Resuming from {0}".format(resume))
+        p, state = Checkpointer.restore_checkpoint(resume)
+        gen = state["gen"]
+        BEST = state["best"]
+        SEED = state["seed"]
+    else:
+        if seed is not None:
+            random.seed(seed)
+        elif FIXED_COURSE:
+            SEED = random.randrange(2 ** 32)
 
-    # Create the population, which is the top-level object for a NEAT run.
-    p = neat.Population(config)
+        config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                             BatchSpeciesSet, neat.DefaultStagnation,
+                             config_file)
+
+        # Create the population, which is the top-level object for a NEAT run.
+        p = neat.Population(config)
 
     # Add a stdout reporter to show progress in the terminal.
     p.add_reporter(neat.StdOutReporter(True))
-    stats = neat.StatisticsReporter()
-    p.add_reporter(stats)
-    #p.add_reporter(neat.Checkpointer(5))
-
-    # Run for up to 50 generations.
-    winner = p.run(eval_genomes, 50)
+    if STATS_FILE:
+        p.add_reporter(StatsWriter(WRITER, STATS_FILE, p.generation))
+    if headless and FITNESS_CACHE.size > 0:
+        p.add_reporter(CacheReporter("Fitness cache", FITNESS_CACHE))
+    if workers == 1 and COMPILE_CACHE.size > 0:
+        # with workers, each process has its own
+        p.add_reporter(CacheReporter("Compile cache", COMPILE_CACHE))
+    if profile:
+        PROFILER = FrameProfiler()
+        p.add_reporter(ProfileReporter(PROFILER, WRITER, profile))
+    if CHECKPOINT_GENERATIONS or CHECKPOINT_SECONDS:
+        p.add_reporter(Checkpointer(WRITER, checkpoint_state,
+                                    CHECKPOINT_GENERATIONS or None, CHECKPOINT_SECONDS or None,
+                                    CHECKPOINT_PREFIX))
+
+    # last, so the other reporters see the generation STOP was clicked in.
+    # It checks for STOP from watch_training every generation, however short
+    p.add_reporter(StopReporter(stop_requested))
+
+    # Run for up to the given generations in all, counting any before the checkpoint.
+    try:
+        if workers == 1:
+            winner = p.run(eval_genomes, generations - p.generation)
+        else:
+            evaluator = ParallelEvaluator(workers or multiprocessing.cpu_count(), config_file)
+            winner = p.run(evaluator.evaluate, generations - p.generation)
+    except TrainingStopped as e:
+        print("Training stopped")
+        if p.best_genome is None or e.best_genome.fitness > p.best_genome.fitness:
+            p.best_genome = e.best_genome
+        winner = p.best_genome
+    WRITER.flush()
 
     # show final stats
     print('\nBest genome:\n{!s}'.format(winner))
+    return p
 
+def train_in_background(snapshot_name, conn, seed = None, resume = None, profile = None):
+    """
+    train headless in the process started by watch_training, publishing
+    frames to its Snapshot and stopping when it sends "stop"
+    :param snapshot_name: shared memory name of the Snapshot
+    :param conn: this process' end of a Pipe to the window
+    :param seed: seed for the pipe course
+    :param resume: checkpoint to carry on from
+    :param profile: file to export frame timings to
+    :return: None
+    """
+    from snapshot import Snapshot
+
+    global SNAPSHOT, CONTROL
+    SNAPSHOT = Snapshot(snapshot_name)
+    CONTROL = conn
+    init_headless()
+    try:
+        run(CONFIG_PATH, headless = True, seed = seed, resume = resume, profile = profile)
+    finally:
+        SNAPSHOT.close()
+
+def watch_training(seed = None, resume = None, profile = None):
+    """
+    train in another process and draw the frames it publishes, at
+    SNAPSHOT_RATE, so the window stays responsive and training runs
+    at full speed whether or not anyone is watching. Clicking STOP
+    sends "stop" to the training process, which ends like visual training
+    :param seed: seed for the pipe course
+    :param resume: checkpoint to carry on from
+    :param profile: file to export frame timings to
+    :return: None once training has ended
+    """
+    import multiprocessing
+    from snapshot import Snapshot
+
+    snapshot = Snapshot(bees = Swarm.TOP + Swarm.SAMPLED, rows = game.STRIP_ROWS)
+    # a fresh interpreter rather than a fork of this one, which has the window open
+    context = multiprocessing.get_context("spawn")
+    conn, child = context.Pipe()
+    trainer = context.Process(target = train_in_background, args = (snapshot.name, child, seed, resume, profile),
+                              name = "trainer", daemon = True)
+    trainer.start()
+
+    renderer = Renderer(WINDOW, sky_img)
+    ground = Ground(700, ground_img)
+    pipes = [] # Pipes moved to where the latest frame's are
+    stop_button = button_print("STOP", (255,47,154), 75, 40, 0.5)
+    clock = pygame.time.Clock()
+    stopping = False
+    while trainer.is_alive():
+        clock.tick(SNAPSHOT_RATE)
+        mouse = pygame.mouse.get_pos()
+        on_stop = stop_button[0] < mouse[0] < stop_button[0] + stop_button[2] and \
+            stop_button[1] < mouse[1] < stop_button[1] + stop_button[3]
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                # let training finish writing its files, but don't hang
+                # the window if it doesn't
+                conn.send("stop")
+                deadline = time.time() + 10
+                while trainer.is_alive() and time.time() < deadline:
+                    pygame.event.pump()
+                    trainer.join(1 / SNAPSHOT_RATE)
+                if trainer.is_alive():
+                    trainer.terminate()
+                snapshot.close()
+                snapshot.unlink()
+                pygame.quit()
+                quit()
+            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and on_stop and not stopping:
+                conn.send("stop")
+                stopping = True
+
+        sequence, frame = snapshot.read()
+        count = frame.pipe_count
+        while len(pipes) < count:
+            pipes.append(Pipe(WIDTH, pipe_img, 0))
+        del pipes[count:]
+        for pipe, x, height in zip(pipes, frame.pipe_x.tolist(), frame.pipe_heights.tolist()):
+            pipe.x = int(x)
+            pipe.set_height(int(height))
+        ground.move()
+        draw_window_snapshot(renderer, frame, ground, pipes, on_stop or stopping)
 
+    trainer.join()
+    snapshot.close()
+    snapshot.unlink()
 
-play_button = button_print("PLAY", (255,47,154), WIDTH/2, HEIGHT/2 - 50, 0.5)
-train_button = button_print("TRAIN", (155,75,160), WIDTH/2, HEIGHT/2 + 25, 0.5)
-watch_button = button_print("WATCH", (0,121,231), WIDTH/2, HEIGHT/2 + 100, 0.5)
-
-on_play = False
-on_train = False
-on_watch = False
-while(1):
-    
-    WINDOW.blit(sky_img, (0,0))
-    WINDOW.blit(ground_img, (0,700))
-    hb_label = FONT.render("HAPPY BEE!",1,(255,173,47))
-    WINDOW.blit(hb_label, (WIDTH/2 - 100, HEIGHT/4))
-
+def island(index, config_file, seed, conn, state = None, generations = 50):
+    """
+    evolve one island's population, in its own process. It trains like
+    run(), but reports to the main process instead of printing, and
+    swaps genomes with the other islands every MIGRATION_INTERVAL generations
+    :param index: the island's number
+    :param config_file: location of config file
+    :param seed: the island's seed, for its pipe courses and evolution
+    :param conn: the island's end of a Pipe to the main process
+    :param state: checkpointed state to carry on from, None to start a new population
+    :param generations: generations to train for in all, counting any before the checkpoint
+    :return: None
+    """
+    import neat
+    from checkpoint import Checkpointer
+    from reporters import IslandReporter, StatsWriter
+    from speciation import BatchSpeciesSet
+
+    global HEADLESS, SEED, BEST, ISLAND, gen
+    HEADLESS = True
+    ISLAND = conn
+    init_headless()
+    load_settings(config_file)
+
+    if state is not None:
+        p, saved = Checkpointer.loads(state)
+        gen = saved["gen"]
+        BEST = saved["best"]
+        SEED = saved["seed"]
+    else:
+        SEED = seed
+        random.seed(seed)
+        config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                             BatchSpeciesSet, neat.DefaultStagnation,
+                             config_file)
+        p = neat.Population(config)
+
+    def dumps(config, population, species_set, generation):
+        return Checkpointer.dumps(config, population, species_set, generation, checkpoint_state())
+    checkpoint = dumps if CHECKPOINT_GENERATIONS or CHECKPOINT_SECONDS else None
+
+    if STATS_FILE:
+        # each island gets its own file, like happy-bee-stats-island0.csv
+        name, ext = os.path.splitext(STATS_FILE)
+        p.add_reporter(StatsWriter(WRITER, "{0}-island{1}{2}".format(name, index, ext), p.generation))
+    p.add_reporter(IslandReporter(index, conn, p.reproduction, MIGRATION_INTERVAL, MIGRANTS, checkpoint))
+    winner = p.run(eval_genomes, generations - p.generation)
+    WRITER.flush()
+    conn.send(("done", index, winner))
+
+def run_islands(config_file, islands, seed = None, resume = None, generations = 50):
+    """
+    train several populations (islands) at once, each in its own process
+    with its own seed and courses. Every MIGRATION_INTERVAL generations each
+    island sends its best genomes to the next island round the ring
+    :param config_file: location of config file
+    :param islands: number of islands
+    :param seed: seed for the islands' seeds, so runs can be repeated
+    :param resume: island checkpoint to carry on from, "latest" for the newest one
+    :param generations: generations each island trains for in all, counting any before the checkpoint
+    :return: None
+    """
+    import neat
+    import multiprocessing
+    from multiprocessing.connection import wait
+    from checkpoint import Checkpointer
+    from speciation import BatchSpeciesSet
+
+    global BEST
+    load_settings(config_file)
+    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                         BatchSpeciesSet, neat.DefaultStagnation,
+                         config_file)
+    prefix = CHECKPOINT_PREFIX + "islands-"
+
+    if resume == "latest":
+        resume = Checkpointer.latest(prefix)
+        if resume is None:
+            print("No island checkpoints to resume from, starting a new run")
+
+    rng = random.Random(seed)
+    seeds = [rng.randrange(2 ** 32) for i in range(islands)]
+    states = [None] * islands
+    if resume is not None:
+        print("Resuming from {0}".format(resume))
+        with open(resume, "rb") as f:
+            BEST, states = pickle.loads(gzip.decompress(f.read()))
+        islands = len(states)
+
+    conns = {} # the main process' end of each island's pipe, by island
+    processes = []
+    for index in range(islands):
+        conns[index], child = multiprocessing.Pipe()
+        process = multiprocessing.Process(target = island, args = (index, config_file, seeds[index], child, states[index], generations),
+                                          name = "island-{0}".format(index), daemon = True)
+        process.start()
+        processes.append(process)
+
+    best = None # the best genome of all the islands so far
+    best_island = None
+    winners = []
+    migrants = {} # best genomes of each island waiting for the others to migrate
+    saved = {} # checkpointed state of each island waiting for the others
+    running = dict((conn, index) for index, conn in conns.items())
+    while running:
+        for conn in wait(list(running)):
+            index = running[conn]
+            try:
+                message = conn.recv()
+            except EOFError:
+                print("Island {0} stopped unexpectedly".format(index))
+                del running[conn]
+                continue
 
-    mouse = pygame.mouse.get_pos()
-    for event in pygame.event.get():
+            kind = message[0]
+            if kind == "report":
+                generation, mean, species, genome = message[2:]
+                if best is None or genome.fitness > best.fitness:
+                    best = genome
+                    best_island = index
+                print("Island {0} generation {1}: best fitness {2:.3f}, mean {3:.3f}, {4} species, "
+                      "best of all islands {5:.3f} (island {6})".format(
+                      index, generation, genome.fitness, mean, species, best.fitness, best_island))
+            elif kind == "best":
+                score, genome = message[1:]
+                save_best(genome, config, score)
+            elif kind == "migrants":
+                migrants[index] = message[2]
+            elif kind == "state":
+                generation = message[2]
+                saved[index] = message[3]
+            elif kind == "done":
+                winners.append(message[2])
+                del running[conn]
+
+        waiting = sorted(running.values())
+        if migrants and sorted(migrants) == waiting:
+            # every island still evolving is waiting to migrate
+            for k, index in enumerate(waiting):
+                source = waiting[k - 1]
+                conns[index].send(migrants[source] if source != index else [])
+            migrants = {}
+        if saved and sorted(saved) == waiting:
+            filename = "{0}{1}".format(prefix, generation)
+            print("Saving checkpoint to {0}".format(filename))
+            WRITER.write(filename, pickle.dumps((BEST, [saved[index] for index in waiting])), compress = True)
+            saved = {}
+
+    for process in processes:
+        process.join()
+    WRITER.flush()
+
+    winners = [winner for winner in winners if winner is not None]
+    if winners:
+        print('\nBest genome:\n{!s}'.format(max(winners, key = lambda genome: genome.fitness)))
+
+def menu(seed = None, resume = None, profile = None, inline = False):
+    """
+    show the main menu and start the chosen mode
+    :param seed: seed for the pipe course when training
+    :param resume: checkpoint training carries on from
+    :param profile: file training exports frame timings to
+    :param inline: train in this process, with the speed buttons, instead of in the background
+    :return: None
+    """
+    # text, colour and height of each button
+    buttons = [("PLAY", (255,47,154), HEIGHT/2 - 50),
+               ("TRAIN", (155,75,160), HEIGHT/2 + 25),
+               ("WATCH", (0,121,231), HEIGHT/2 + 100)]
+    hover = None # which button the mouse is over
+    redraw = True
+    while(1):
+        if redraw:
+            WINDOW.blit(sky_img, (0,0))
+            WINDOW.blit(ground_img, (0,700))
+            WINDOW.blit(label("HAPPY BEE!", (255,173,47), 50), (WIDTH/2 - 100, HEIGHT/4))
+            dims = [button_print(text, (100,100,100) if i == hover else color, WIDTH/2, h, 0.5)
+                    for i, (text, color, h) in enumerate(buttons)]
+            pygame.display.update()
+            redraw = False
+
+        # sleep until something happens, the menu only changes when it does
+        event = pygame.event.wait()
         if event.type == pygame.QUIT:
             pygame.quit()
             quit()
-        if play_button[0] < mouse[0] < play_button[0] + play_button[2] and \
-            play_button[1] < mouse[1] < play_button[1] + play_button[3]:
-            play_button = button_print("PLAY", (100,100,100),  WIDTH/2, HEIGHT/2 - 50, 0.5)
-            on_play = True
-        else:		
-            play_button = button_print("PLAY", (255,47,154),  WIDTH/2, HEIGHT/2 - 50, 0.5)
-            on_play = False
-        if train_button[0] < mouse[0] < train_button[0] + train_button[2] and \
-            train_button[1] < mouse[1] < train_button[1] + train_button[3]:
-            train_button = button_print("TRAIN", (100,100,100),  WIDTH/2, HEIGHT/2 + 25, 0.5)
-            on_train = True
-        else:		
-            train_button = button_print("TRAIN", (155,75,160),  WIDTH/2, HEIGHT/2 + 25, 0.5)
-            on_train = False
-        if watch_button[0] < mouse[0] < watch_button[0] + watch_button[2] and \
-            watch_button[1] < mouse[1] < watch_button[1] + watch_button[3]:
-            watch_button = button_print("WATCH", (100,100,100),  WIDTH/2, HEIGHT/2 + 100, 0.5)
-            on_watch = True
-        else:		
-            watch_button = button_print("WATCH", (0,121,231),  WIDTH/2, HEIGHT/2 + 100, 0.5)
-            on_watch = False
-        if pygame.mouse.get_pressed()[0]:
-            if play_button[0] < mouse[0] < play_button[0] + play_button[2] and \
-                play_button[1] < mouse[1] < play_button[1] + play_button[3]:
-                    play()
-                    break;
-            elif train_button[0] < mouse[0] < train_button[0] + train_button[2] and \
-                train_button[1] < mouse[1] < train_button[1] + train_button[3]:
-                    run('happy-bee-config.ini')
-                    break;
-            elif watch_button[0] < mouse[0] < watch_button[0] + watch_button[2] and \
-                watch_button[1] < mouse[1] < watch_button[1] + watch_button[3]:
-                    watch('best.pickle')
-                    break;
-    else:
-        if on_play:
-            play_button = button_print("PLAY", (100,100,100), WIDTH/2, HEIGHT/2 - 50, 0.5)
-        else:
-            play_button = button_print("PLAY", (255,47,154),  WIDTH/2, HEIGHT/2 - 50, 0.5)
-        if on_train:
-            train_button = button_print("TRAIN", (100,100,100), WIDTH/2, HEIGHT/2 + 25, 0.5)
-        else:
-            train_button = button_print("TRAIN", (155,75,160),  WIDTH/2, HEIGHT/2 + 25, 0.5)
-        if on_watch:
-            watch_button = button_print("WATCH", (100,100,100), WIDTH/2, HEIGHT/2 + 100, 0.5)
-        else:
-            watch_button = button_print("WATCH", (0,121,231),  WIDTH/2, HEIGHT/2 + 100, 0.5)
-    pygame.display.update()
 
-'''
+        mouse = pygame.mouse.get_pos()
+        over = None
+        for i, dim in enumerate(dims):
+            if dim[0] < mouse[0] < dim[0] + dim[2] and dim[1] < mouse[1] < dim[1] + dim[3]:
+                over = i
+        if over != hover:
+            hover = over
+            redraw = True
+
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and over is not None:
+            choice = buttons[over][0]
+            if choice == "PLAY":
+                play()
+            elif choice == "TRAIN":
+                if inline:
+                    run(CONFIG_PATH, seed = seed, resume = resume, profile = profile)
+                else:
+                    watch_training(seed, resume, profile)
+            else:
+                watch('best.npz' if os.path.exists('best.npz') else 'best.pickle')
+            redraw = True
+
+def main():
+    parser = argparse.ArgumentParser(description = "Happy Bee!")
+    parser.add_argument("--headless", action = "store_true",
+                        help = "train without a window, frame cap or drawing")
+    parser.add_argument("--seed", type = int, default = None,
+                        help = "seed for the pipe course, so runs can be repeated")
+    parser.add_argument("--workers", type = int, default = 1,
+                        help = "processes evaluating genomes with --headless, 0 for one per core")
+    parser.add_argument("--resume", nargs = "?", const = "latest", default = None, metavar = "CHECKPOINT",
+                        help = "carry on training from a checkpoint, the latest one if none is given")
+    parser.add_argument("--islands", type = int, default = 1,
+                        help = "with --headless, evolve this many populations in separate processes, swapping their best genomes")
+    parser.add_argument("--profile", metavar = "FILE", default = None,
+                        help = "time each phase of the training frames, printed each generation and added to FILE (.csv or .jsonl)")
+    parser.add_argument("--inline", action = "store_true",
+                        help = "train in the window's process when TRAIN is clicked, with the training speed buttons")
+    parser.add_argument("--plot", metavar = "STATS",
+                        help = "plot the fitness from a statistics file (like happy-bee-stats.csv) to avg_fitness.svg, then exit")
+    parser.add_argument("--export", metavar = "PICKLE",
+                        help = "export a pickled net (like best.pickle) to an .npz model for watching, then exit")
+    args = parser.parse_args()
+    if args.workers != 1 and not args.headless:
+        parser.error("--workers needs --headless")
+    if args.profile and args.workers != 1:
+        parser.error("--profile times the frames of a single process, it can't be used with --workers")
+    if args.islands != 1 and (not args.headless or args.workers != 1 or args.profile):
+        parser.error("--islands needs --headless, and can't be used with --workers or --profile")
+
+    if args.export:
+        export(args.export, os.path.splitext(args.export)[0] + ".npz")
+        return
+
+    if args.plot:
+        import visualize
+        visualize.plot_stats_file(args.plot)
+        return
+
+    if args.islands != 1:
+        run_islands(CONFIG_PATH, args.islands, seed = args.seed, resume = args.resume)
+        return
+
+    if args.headless:
+        init_headless()
+        run(CONFIG_PATH, headless = True, seed = args.seed, workers = args.workers, resume = args.resume,
+            profile = args.profile)
+        return
+
+    init_window()
+    menu(seed = args.seed, resume = args.resume, profile = args.profile, inline = args.inline)
+
 if __name__ == '__main__':
-    # Determine path to configuration file. This path manipulation is
-    # here so that the script will run successfully regardless of the
-    # current working directory.
-    local_dir = os.path.dirname(__file__)
-    config_path = os.path.join(local_dir, 'happy-bee-config.ini')
-    run(config_path)
-'''
\ No newline at end of file
+    main()
@@ -0,0 +1,95 @@
+import io
+import csv
+import json
+import time
+
+# the parts of a frame the eval loop times
+PHASES = ("setup", "network", "move", "collide", "pipes", "wait", "events", "draw")
+# the work the eval loop counts
+COUNTS = ("frames", "bee_steps", "collision_tests", "renders")
+# what is recorded about each generation, in the order of the CSV columns
+FIELDS = ("generation", "total") + PHASES + ("other",) + COUNTS
+
+
+def is_json(filename):
+    """
+    :param filename: a profile file
+    :return: Bool, True for JSON lines and False for CSV
+    """
+    return filename.endswith(".jsonl") or filename.endswith(".json")
+
+def header(filename):
+    """
+    what a profile file starts with before its first generation
+    :param filename: a profile file
+    :return: bytes
+    """
+    return b"" if is_json(filename) else (",".join(FIELDS) + "\n").encode()
+
+def format_record(record, filename):
+    """
+    one generation's totals as a line of a profile file
+    :param record: dict with FIELDS, from FrameProfiler.end_generation
+    :param filename: a profile file, the format depends on its extension
+    :return: bytes
+    """
+    if is_json(filename):
+        return (json.dumps(record) + "\n").encode()
+    out = io.StringIO()
+    csv.DictWriter(out, FIELDS, lineterminator = "\n").writerow(record)
+    return out.getvalue().encode()
+
+
+class FrameProfiler:
+    """
+    Adds up how long the eval loop spends in each phase of its frames
+    and counts the work it does, one generation at a time
+    """
+
+    def __init__(self):
+        """
+        Initialize the object
+        :return: None
+        """
+        self.reset()
+
+    def reset(self):
+        """
+        start counting from zero
+        :return: None
+        """
+        self.times = dict.fromkeys(PHASES, 0.0)
+        self.counts = dict.fromkeys(COUNTS, 0)
+        self.start = time.perf_counter()
+
+    def lap(self, phase, since):
+        """
+        add the time since the last lap to a phase
+        :param phase: one of PHASES
+        :param since: time.perf_counter() at the last lap
+        :return: time.perf_counter() now, to time the next phase from
+        """
+        now = time.perf_counter()
+        self.times[phase] += now - since
+        return now
+
+    def count(self, name, n = 1):
+        """
+        :param name: one of COUNTS
+        :param n: how many to add
+        :return: None
+        """
+        self.counts[name] += int(n)
+
+    def end_generation(self, generation):
+        """
+        total up a generation and start counting the next one
+        :param generation: the generation's number
+        :return: dict of the generation's totals
+        """
+        record = {"generation": generation, "total": time.perf_counter() - self.start}
+        record.update(self.times)
+        record["other"] = max(0.0, record["total"] - sum(self.times.values()))
+        record.update(self.counts)
+        self.reset()
+        return record
@@ -0,0 +1,96 @@
+import pygame
+
+from cache import LRUCache
+
+FONT_NAME = "Avenir"
+
+_fonts = {} # fonts by size, looking a system font up is slow
+_labels = LRUCache(256) # rendered text by size, text and colour
+
+
+def font(size):
+    """
+    the game's font, only looked up the first time each size is used
+    :param size: point size
+    :return: pygame Font
+    """
+    if size not in _fonts:
+        _fonts[size] = pygame.font.SysFont(FONT_NAME, size)
+    return _fonts[size]
+
+def label(text, color, size):
+    """
+    text rendered in the game's font, only rendered again once it changes
+    :param text: string
+    :param color: (r, g, b) tuple
+    :param size: point size
+    :return: pygame Surface
+    """
+    key = (size, text, color)
+    surface = _labels.get(key)
+    if surface is None:
+        surface = font(size).render(text, 1, color)
+        _labels.put(key, surface)
+    return surface
+
+
+
+class Renderer:
+    """
+    Draws a game screen with dirty rectangles. Each frame only the parts
+    of the window that something was drawn on (this frame or the last one)
+    are redrawn and sent to the display, in a single update
+    """
+
+    def __init__(self, win, background):
+        """
+        Initialize the object
+        :param win: the pygame window
+        :param background: image drawn behind everything, at the top left
+        :return: None
+        """
+        self.win = win
+        self.background = pygame.Surface(win.get_size()).convert()
+        self.background.blit(background, (0,0))
+        self.drawn = [] # what was drawn last frame
+        self.frame = [] # what has been drawn this frame
+        self.full = True # the next frame redraws the whole window
+
+    def begin_frame(self):
+        """
+        start a frame by painting the background back over
+        everything that was drawn last frame
+        :return: None
+        """
+        if self.full:
+            self.win.blit(self.background, (0,0))
+        else:
+            for rect in self.drawn:
+                self.win.blit(self.background, rect, rect)
+
+    def add(self, rects):
+        """
+        mark parts of the window as drawn this frame
+        :param rects: a Rect (or rect style list), a list of them or None
+        :return: None
+        """
+        if rects is None:
+            return
+        if isinstance(rects, list) and rects and not isinstance(rects[0], (int, float)):
+            for rect in rects:
+                self.add(rect)
+            return
+        self.frame.append(pygame.Rect(rects))
+
+    def end_frame(self):
+        """
+        send everything that changed to the display
+        :return: None
+        """
+        if self.full:
+            pygame.display.update()
+            self.full = False
+        else:
+            pygame.display.update(self.drawn + self.frame)
+        self.drawn = self.frame
+        self.frame = []
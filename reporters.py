@@ -0,0 +1,200 @@
+import os
+import time
+
+from neat.reporting import BaseReporter
+
+import stats
+from profiler import PHASES, header as profile_header, format_record as profile_record
+
+
+class CacheReporter(BaseReporter):
+    """
+    Prints a cache's hits and misses after each generation is evaluated,
+    next to neat's StdOutReporter output
+    """
+
+    def __init__(self, name, cache):
+        """
+        :param name: what to call the cache in the output
+        :param cache: LRUCache
+        :return: None
+        """
+        self.name = name
+        self.cache = cache
+
+    def post_evaluate(self, config, population, species, best_genome):
+        print("{0}: {1} hits, {2} misses, {3} entries".format(
+            self.name, self.cache.hits, self.cache.misses, len(self.cache)))
+
+
+class ProfileReporter(BaseReporter):
+    """
+    Prints where each generation's evaluation time went, from a
+    FrameProfiler, and adds a line about it to a CSV or JSON lines file
+    """
+
+    def __init__(self, profiler, writer = None, filename = None):
+        """
+        :param profiler: the FrameProfiler the eval loop times itself with
+        :param writer: BackgroundWriter for the file
+        :param filename: where to export the totals, None to only print them
+        :return: None
+        """
+        self.profiler = profiler
+        self.writer = writer
+        self.filename = filename
+        self.generation = None
+        if filename:
+            writer.write(filename, profile_header(filename))
+
+    def start_generation(self, generation):
+        self.generation = generation
+        self.profiler.reset()
+
+    def post_evaluate(self, config, population, species, best_genome):
+        record = self.profiler.end_generation(self.generation)
+        total = record["total"] or 1
+        phases = ", ".join("{0} {1:.0%}".format(phase, record[phase] / total)
+                           for phase in PHASES + ("other",) if record[phase] > 0)
+        print("Profile: {0:.3f} sec, {1} frames, {2} bee steps, {3} collision tests, {4} renders".format(
+            record["total"], record["frames"], record["bee_steps"], record["collision_tests"], record["renders"]))
+        print("Profile: {0}".format(phases))
+        if self.filename:
+            self.writer.append(self.filename, profile_record(record, self.filename))
+
+
+class TrainingStopped(Exception):
+    """
+    Raised by StopReporter to end neat's Population.run early
+    """
+
+    def __init__(self, best_genome):
+        Exception.__init__(self, "training stopped")
+        self.best_genome = best_genome
+
+
+class StopReporter(BaseReporter):
+    """
+    Ends training after the generation STOP was clicked in, once every
+    other reporter has seen its results. neat has no way to stop a run
+    between generations, so it raises TrainingStopped for run() to catch
+    """
+
+    def __init__(self, stopped):
+        """
+        :param stopped: function returning True once training should stop
+        :return: None
+        """
+        self.stopped = stopped
+
+    def post_evaluate(self, config, population, species, best_genome):
+        if self.stopped():
+            raise TrainingStopped(best_genome)
+
+
+class IslandReporter(BaseReporter):
+    """
+    Runs in the process of one island of an island model run. It sends
+    each generation's results to the main process, and every so many
+    generations swaps the island's best genomes for another island's
+    """
+
+    def __init__(self, index, conn, reproduction, interval, migrants, checkpoint = None):
+        """
+        :param index: the island's number
+        :param conn: the island's end of a multiprocessing Pipe to the main process
+        :param reproduction: the island population's reproduction, to number immigrants
+        :param interval: generations between migrations, 0 for none
+        :param migrants: how many of its best genomes an island sends
+        :param checkpoint: function(config, population, species_set, generation)
+                           returning the island's state to save after each migration,
+                           None to not checkpoint
+        :return: None
+        """
+        self.index = index
+        self.conn = conn
+        self.reproduction = reproduction
+        self.interval = interval
+        self.migrants = migrants
+        self.checkpoint = checkpoint
+        self.generation = None
+        self.best = []
+
+    def start_generation(self, generation):
+        self.generation = generation
+
+    def post_evaluate(self, config, population, species, best_genome):
+        fitnesses = [genome.fitness for genome in population.values()]
+        self.conn.send(("report", self.index, self.generation, sum(fitnesses) / len(fitnesses),
+                        len(species.species), best_genome))
+        self.best = sorted(population.values(), key = lambda genome: genome.fitness, reverse = True)[:self.migrants]
+
+    def end_generation(self, config, population, species_set):
+        if self.interval <= 0 or (self.generation + 1) % self.interval:
+            return
+        self.conn.send(("migrants", self.index, self.best))
+        immigrants = self.conn.recv()
+
+        if immigrants:
+            # the immigrants take the place of the newest children, never the elites
+            for key in sorted(population)[-len(immigrants):]:
+                del population[key]
+            for genome in immigrants:
+                genome.key = next(self.reproduction.genome_indexer)
+                genome.fitness = None
+                population[genome.key] = genome
+                self.reproduction.ancestors[genome.key] = tuple()
+            species_set.speciate(config, population, self.generation)
+
+        if self.checkpoint is not None:
+            self.conn.send(("state", self.index, self.generation,
+                            self.checkpoint(config, population, species_set, self.generation)))
+
+
+class StatsWriter(BaseReporter):
+    """
+    Adds a line of statistics about each generation to a JSON lines or CSV
+    file, through a BackgroundWriter. Unlike neat's StatisticsReporter it
+    keeps nothing in memory, so every generation costs the same
+    """
+
+    def __init__(self, writer, filename, generation = 0):
+        """
+        :param writer: BackgroundWriter
+        :param filename: .jsonl (or .json) for JSON lines, anything else for CSV
+        :param generation: the generation the run starts at. Records from this
+                           generation on, left by a run that got further before
+                           the checkpoint it resumes from, are dropped
+        :return: None
+        """
+        self.writer = writer
+        self.filename = filename
+        self.generation = None
+        self.start = None
+
+        if generation > 0 and os.path.exists(filename):
+            # anything already queued for the file goes in first
+            writer.flush()
+            stats.truncate(filename, generation)
+        else:
+            writer.write(filename, stats.header(filename).encode())
+
+    def start_generation(self, generation):
+        self.generation = generation
+        self.start = time.time()
+
+    def post_evaluate(self, config, population, species, best_genome):
+        fitnesses = [genome.fitness for genome in population.values()]
+        mean = sum(fitnesses) / len(fitnesses)
+        record = {
+            "generation": self.generation,
+            "best": best_genome.fitness,
+            "mean": mean,
+            "stdev": (sum((f - mean) ** 2 for f in fitnesses) / len(fitnesses)) ** 0.5,
+            "species": len(species.species),
+            "genomes": len(fitnesses),
+            "best_nodes": len(best_genome.nodes),
+            "best_connections": sum(1 for conn in best_genome.connections.values() if conn.enabled),
+            "seconds": time.time() - self.start,
+        }
+        self.writer.append(self.filename, stats.format_record(record, self.filename).encode())
@@ -0,0 +1,130 @@
+import numpy as np
+from multiprocessing import shared_memory
+
+# sizes at the start of the buffer, then two slots of
+# HEADER values followed by the bees, pipes and strip
+SIZES = ("sequence", "bees", "pipes", "rows")
+HEADER = ("gen", "score", "alive", "x", "count", "pipe_count")
+
+
+class Frame:
+    """
+    One slot of a Snapshot: numpy arrays over the shared buffer, so
+    reading them never copies the world
+    """
+
+    def __init__(self, values, bees, pipes, rows):
+        """
+        :param values: the slot's float64 array
+        :param bees: most bees drawn one by one
+        :param pipes: most pipes
+        :param rows: rows of the strip
+        :return: None
+        """
+        self.header = values[:len(HEADER)]
+        start = len(HEADER)
+        self.ys = values[start:start + bees]
+        self.tilts = values[start + bees:start + 2 * bees]
+        start += 2 * bees
+        self.pipe_x = values[start:start + pipes]
+        self.pipe_heights = values[start + pipes:start + 2 * pipes]
+        self.strip = values[start + 2 * pipes:start + 2 * pipes + rows]
+
+    def __getattr__(self, name):
+        # gen, score, alive, x, count and pipe_count from the header
+        if name in HEADER:
+            return int(self.header[HEADER.index(name)])
+        raise AttributeError(name)
+
+
+class Snapshot:
+    """
+    The latest frame of training in shared memory, written by the
+    training process and read by the window at its own frame rate.
+    There are two slots: the writer fills the one that isn't being
+    read, then flips the sequence number to it, so neither side waits
+    """
+
+    def __init__(self, name = None, bees = 50, pipes = 4, rows = 100):
+        """
+        create a new snapshot buffer, or attach to one by name
+        :param name: shared memory name of an existing Snapshot, None to create one
+        :param bees: most bees drawn one by one, when creating
+        :param pipes: most pipes, when creating
+        :param rows: rows of the strip, when creating
+        :return: None
+        """
+        if name is None:
+            slot = len(HEADER) + 2 * bees + 2 * pipes + rows
+            self.shm = shared_memory.SharedMemory(create = True, size = (len(SIZES) + 2 * slot) * 8)
+            self.values = np.ndarray((len(SIZES) + 2 * slot,), dtype = np.float64, buffer = self.shm.buf)
+            self.values[:] = 0
+            self.values[1:len(SIZES)] = (bees, pipes, rows)
+        else:
+            self.shm = shared_memory.SharedMemory(name = name)
+            bees, pipes, rows = np.ndarray((len(SIZES),), dtype = np.float64, buffer = self.shm.buf)[1:].astype(int)
+            slot = len(HEADER) + 2 * bees + 2 * pipes + rows
+            self.values = np.ndarray((len(SIZES) + 2 * slot,), dtype = np.float64, buffer = self.shm.buf)
+        self.name = self.shm.name
+        self.bees = int(bees)
+        self.pipes = int(pipes)
+        slots = self.values[len(SIZES):].reshape(2, slot)
+        self.frames = [Frame(slots[i], self.bees, self.pipes, int(rows)) for i in range(2)]
+
+    @property
+    def sequence(self):
+        """
+        :return: int, how many frames have been written
+        """
+        return int(self.values[0])
+
+    def write(self, gen, score, alive, x, ys, tilts, pipe_x, pipe_heights, strip):
+        """
+        publish a frame. Bees and pipes past the snapshot's size are left out
+        :param gen: generation number
+        :param score: pipes passed
+        :param alive: how many bees are flying
+        :param x: x pos of the bees
+        :param ys: array of the y pos of the bees drawn one by one
+        :param tilts: array of their tilts
+        :param pipe_x: array of the x pos of the pipes
+        :param pipe_heights: array of the heights of the pipes
+        :param strip: the bees in each row of the strip, from game.strip_counts
+        :return: None
+        """
+        sequence = self.sequence + 1
+        frame = self.frames[sequence % 2]
+        count = min(len(ys), self.bees)
+        pipe_count = min(len(pipe_x), self.pipes)
+        frame.header[:] = (gen, score, alive, x, count, pipe_count)
+        frame.ys[:count] = ys[:count]
+        frame.tilts[:count] = tilts[:count]
+        frame.pipe_x[:pipe_count] = pipe_x[:pipe_count]
+        frame.pipe_heights[:pipe_count] = pipe_heights[:pipe_count]
+        frame.strip[:] = strip
+        self.values[0] = sequence
+
+    def read(self):
+        """
+        the latest frame. It is only overwritten after the next one is
+        written, so it stays whole as long as it is used within a frame
+        :return: (sequence number, Frame)
+        """
+        sequence = self.sequence
+        return sequence, self.frames[sequence % 2]
+
+    def close(self):
+        """
+        detach from the buffer
+        :return: None
+        """
+        self.frames = []
+        self.values = None
+        self.shm.close()
+
+    def unlink(self):
+        """
+        free the buffer, called by its creator once the other side is done with it
+        :return: None
+        """
+        self.shm.unlink()
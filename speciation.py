@@ -0,0 +1,208 @@
+import numpy as np
+from neat import DefaultSpeciesSet
+from neat.species import Species
+
+
+def gene_distances(genes, rep, weight_coefficient, disjoint_coefficient):
+    """
+    the node or connection part of neat's genome distance, between one
+    genome and every genome at once
+    :param genes: the GeneMatrix nodes or connections
+    :param rep: row of the one genome
+    :param weight_coefficient: compatibility_weight_coefficient
+    :param disjoint_coefficient: compatibility_disjoint_coefficient
+    :return: array (genomes,)
+    """
+    rows, cols, continuous, categorical, counts, starts, width = genes
+    mine = slice(starts[rep], starts[rep] + counts[rep])
+
+    # the one genome's genes, by column
+    has = np.zeros(width, dtype = bool)
+    has[cols[mine]] = True
+    rep_continuous = np.zeros((width, continuous.shape[1]))
+    rep_continuous[cols[mine]] = continuous[mine]
+    rep_categorical = np.zeros((width, categorical.shape[1]))
+    rep_categorical[cols[mine]] = categorical[mine]
+
+    # compare every gene with the one genome's gene of the same innovation
+    homologous = has[cols]
+    d = np.abs(continuous - rep_continuous[cols]).sum(axis = 1) + \
+        (categorical != rep_categorical[cols]).sum(axis = 1)
+    distance = np.bincount(rows, weights = d * weight_coefficient * homologous, minlength = len(counts))
+    shared = np.bincount(rows, weights = homologous, minlength = len(counts))
+    disjoint = counts + counts[rep] - 2 * shared
+    most = np.maximum(counts, counts[rep])
+    return np.where(most > 0, (distance + disjoint_coefficient * disjoint) / np.maximum(most, 1), 0.0)
+
+
+class GeneMatrix:
+    """
+    The genes of a list of genomes in flat arrays, each tagged with the
+    row of its genome and a column for its innovation, so the distances
+    from one genome to all of them can be worked out at once
+    """
+
+    def __init__(self, encodings):
+        """
+        :param encodings: BatchSpeciesSet.encode of each genome
+        :return: None
+        """
+        self.nodes = GeneMatrix.flatten([nodes for nodes, connections in encodings], 2, 2)
+        self.connections = GeneMatrix.flatten([connections for nodes, connections in encodings], 1, 1)
+
+    @staticmethod
+    def flatten(genes, continuous, categorical):
+        """
+        :param genes: each genome's list of (innovation column, values...) of its nodes or connections
+        :param continuous: how many of the values are compared by their difference
+        :param categorical: how many of the values after them are compared by equality
+        :return: (rows, columns, continuous, categorical, genes of each genome,
+                  where each genome's genes start, number of columns)
+        """
+        counts = np.array([len(g) for g in genes], dtype = int)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(int)
+        rows = np.repeat(np.arange(len(genes)), counts)
+        table = np.array([gene for g in genes for gene in g], dtype = float).reshape(-1, 1 + continuous + categorical)
+        # only the innovations these genomes have get a column
+        used, cols = np.unique(table[:, 0].astype(int), return_inverse = True)
+        return (rows, cols.ravel(), table[:, 1:1 + continuous], table[:, 1 + continuous:],
+                counts, starts, len(used))
+
+    def distances(self, row, config):
+        """
+        neat's genome distance between one genome and every genome
+        :param row: the one genome's row
+        :param config: genome config, with the compatibility coefficients
+        :return: array (genomes,)
+        """
+        return gene_distances(self.nodes, row, config.compatibility_weight_coefficient,
+                              config.compatibility_disjoint_coefficient) + \
+            gene_distances(self.connections, row, config.compatibility_weight_coefficient,
+                           config.compatibility_disjoint_coefficient)
+
+
+class BatchSpeciesSet(DefaultSpeciesSet):
+    """
+    neat's DefaultSpeciesSet, but the genomes' genes are lined up in arrays
+    by innovation and their distances to each representative are worked
+    out all at once, instead of pairwise in Python. Each genome's genes are
+    only encoded once, when it first shows up, since genomes don't change
+    """
+
+    def __init__(self, config, reporters):
+        DefaultSpeciesSet.__init__(self, config, reporters)
+        self.node_columns = {} # column of each node innovation
+        self.connection_columns = {} # column of each connection innovation
+        self.names = {} # a number for each activation and aggregation name
+        self.encodings = {} # the encoded genes of the current genomes, by genome key
+
+    def encode(self, genome):
+        """
+        a genome's genes as numbers, cached by the genome's key
+        :param genome: neat genome
+        :return: (list of (column, bias, response, activation, aggregation) of the nodes,
+                  list of (column, weight, enabled) of the connections)
+        """
+        genes = self.encodings.get(genome.key)
+        if genes is None:
+            names = self.names
+            node_columns = self.node_columns
+            connection_columns = self.connection_columns
+            genes = ([(node_columns.setdefault(key, len(node_columns)), node.bias, node.response,
+                       names.setdefault(node.activation, len(names)), names.setdefault(node.aggregation, len(names)))
+                      for key, node in genome.nodes.items()],
+                     [(connection_columns.setdefault(key, len(connection_columns)), conn.weight, conn.enabled)
+                      for key, conn in genome.connections.items()])
+            self.encodings[genome.key] = genes
+        return genes
+
+    def speciate(self, config, population, generation):
+        """
+        Place genomes into species by genetic similarity, the same way
+        DefaultSpeciesSet does
+        :param config: NEAT config
+        :param population: dict of the genomes by key
+        :param generation: the generation's number
+        :return: None
+        """
+        assert isinstance(population, dict)
+        genome_config = config.genome_config
+        compatibility_threshold = self.species_set_config.compatibility_threshold
+
+        # genomes are taken in the order DefaultSpeciesSet takes them from its
+        # set, so the species come out the same. That order is how CPython
+        # lays out a set of ints built from an iterator (one built from the
+        # dict directly is laid out differently), an implementation detail
+        # that tests/test_speciation.py checks. Any other order still gives
+        # valid species, just not neat's
+        order = list(set(iter(population.keys())))
+        position = dict((gid, row) for row, gid in enumerate(order))
+        representatives = [s.representative for s in self.species.values()]
+        matrix = GeneMatrix([self.encode(population[gid]) for gid in order] +
+                            [self.encode(genome) for genome in representatives])
+        computed = []
+
+        # the new representative of each species is the genome closest to the old one
+        unspeciated = np.ones(len(order), dtype = bool)
+        new_representatives = {}
+        new_members = {}
+        for i, sid in enumerate(self.species):
+            d = matrix.distances(len(order) + i, genome_config)[:len(order)]
+            computed.append(d[unspeciated])
+            row = int(np.argmin(np.where(unspeciated, d, np.inf)))
+            new_representatives[sid] = order[row]
+            new_members[sid] = [order[row]]
+            unspeciated[row] = False
+
+        # every other genome joins the species with the closest representative
+        # under the threshold, or starts a new one. Only starting a species
+        # changes where the genomes after it go, so the genomes up to the
+        # next one that does are placed together
+        rows = np.flatnonzero(unspeciated)
+        sids = list(new_representatives)
+        columns = [matrix.distances(position[rid], genome_config)[rows] for rid in new_representatives.values()]
+        start = 0
+        while start < len(rows):
+            # the last column stands for no species
+            d = np.column_stack([c[start:] for c in columns] + [np.full(len(rows) - start, np.inf)])
+            d[d >= compatibility_threshold] = np.inf
+            best = np.argmin(d, axis = 1)
+            alone = np.flatnonzero(np.isinf(d.min(axis = 1)))
+            end = start + int(alone[0]) if len(alone) else len(rows)
+            for row, column in zip(rows[start:end].tolist(), best[:end - start].tolist()):
+                new_members[sids[column]].append(order[row])
+            computed.extend(c[start:end] for c in columns)
+            if end == len(rows):
+                break
+
+            # no species is similar enough, start a new one
+            sid = next(self.indexer)
+            gid = order[rows[end]]
+            new_representatives[sid] = gid
+            new_members[sid] = [gid]
+            sids.append(sid)
+            columns.append(matrix.distances(int(rows[end]), genome_config)[rows])
+            start = end + 1
+
+        # Update species collection based on new speciation.
+        self.genome_to_species = {}
+        for sid, rid in new_representatives.items():
+            s = self.species.get(sid)
+            if s is None:
+                s = Species(sid, generation)
+                self.species[sid] = s
+
+            members = new_members[sid]
+            for gid in members:
+                self.genome_to_species[gid] = sid
+
+            member_dict = dict((gid, population[gid]) for gid in members)
+            s.update(population[rid], member_dict)
+
+        # the next generation's genomes are compared with these ones
+        self.encodings = dict((gid, self.encodings[gid]) for gid in order)
+
+        computed = np.concatenate(computed) if computed else np.zeros(0)
+        if len(computed):
+            self.reporters.info('Mean genetic distance {0:.3f}, standard deviation {1:.3f}'.format(
+                computed.mean(), computed.std()))
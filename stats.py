@@ -0,0 +1,76 @@
+import io
+import os
+import csv
+import json
+
+# what is recorded about each generation, in the order of the CSV columns
+FIELDS = ("generation", "best", "mean", "stdev", "species", "genomes", "best_nodes", "best_connections", "seconds")
+INTEGERS = ("generation", "species", "genomes", "best_nodes", "best_connections")
+
+
+def is_json(filename):
+    """
+    :param filename: a statistics file
+    :return: Bool, True for JSON lines and False for CSV
+    """
+    return filename.endswith(".jsonl") or filename.endswith(".json")
+
+def header(filename):
+    """
+    what a statistics file starts with before its first record
+    :param filename: a statistics file
+    :return: str
+    """
+    return "" if is_json(filename) else ",".join(FIELDS) + "\n"
+
+def format_record(record, filename):
+    """
+    one generation's line of a statistics file
+    :param record: dict with FIELDS
+    :param filename: a statistics file, the format depends on its extension
+    :return: str
+    """
+    if is_json(filename):
+        return json.dumps(record) + "\n"
+    out = io.StringIO()
+    csv.DictWriter(out, FIELDS, lineterminator = "\n").writerow(record)
+    return out.getvalue()
+
+def read_stats(filename):
+    """
+    read a statistics file one record at a time, so files
+    of any length can be read in constant memory. Lines that
+    were cut short are skipped
+    :param filename: a statistics file
+    :return: generator of dicts with FIELDS
+    """
+    with open(filename, newline = "") as f:
+        rows = f if is_json(filename) else csv.DictReader(f)
+        for row in rows:
+            try:
+                if is_json(filename):
+                    yield json.loads(row)
+                else:
+                    yield dict((key, int(value) if key in INTEGERS else float(value)) for key, value in row.items())
+            except (ValueError, TypeError):
+                pass # a line cut short by a crash, or a blank one
+
+def truncate(filename, generation):
+    """
+    drop the records of a generation and the ones after it, left
+    by a run that got further than the checkpoint a run resumes
+    from. The records are streamed into a new copy of the file,
+    which then replaces it, so files of any length take constant memory
+    :param filename: a statistics file
+    :param generation: the first generation to drop
+    :return: None
+    """
+    temp = "{0}.tmp".format(filename)
+    with open(temp, "w", newline = "") as out:
+        out.write(header(filename))
+        for record in read_stats(filename):
+            if record["generation"] < generation:
+                out.write(format_record(record, filename))
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(temp, filename)
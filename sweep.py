@@ -0,0 +1,266 @@
+"""
+Train Happy Bee headless with many variants of happy-bee-config.ini and
+several seeds each, in a pool of processes, and collect how each one did.
+
+    python sweep.py --set NEAT.pop_size=25,50 --set BatchSpeciesSet.compatibility_threshold=2.5,3,3.5 --seeds 1 2 3
+        train every combination of the values with each seed
+    python sweep.py --random 20 --set DefaultGenome.weight_mutate_rate=0.3:0.9 --set DefaultReproduction.elitism=1,2,3
+        train 20 random combinations, picking from the lists and uniformly from the lo:hi ranges
+
+Every run (a cell of the sweep) trains in its own directory under --out,
+and its row is added to --out/results.csv when it finishes. Running the
+same sweep again skips the cells that already have a row without an
+error, so a sweep that was stopped carries on where it left off and the
+cells that failed are tried again.
+"""
+import os
+import csv
+import json
+import time
+import random
+import hashlib
+import argparse
+import itertools
+import contextlib
+import configparser
+import importlib.util
+import multiprocessing
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(ROOT, "happy-bee-config.ini")
+
+# what is recorded about each cell, after its settings
+RESULTS = ("generations", "solved", "best", "seconds", "error")
+
+
+def parse_setting(text):
+    """
+    :param text: SECTION.key=values, like NEAT.pop_size=25,50 or DefaultGenome.weight_mutate_rate=0.3:0.9
+    :return: ("SECTION.key", list of values or (lo, hi) range)
+    """
+    name, sep, values = text.partition("=")
+    if not sep or "." not in name or not values:
+        raise argparse.ArgumentTypeError("expected SECTION.key=values, not {0}".format(text))
+    if ":" in values:
+        lo, hi = values.split(":", 1)
+        try:
+            float(lo), float(hi)
+        except ValueError:
+            raise argparse.ArgumentTypeError("a range needs numbers, not {0}".format(values))
+        return name, (lo, hi)
+    return name, values.split(",")
+
+
+def pick(values, rng):
+    """
+    one value of a setting for a random combination
+    :param values: list of values, or (lo, hi) range
+    :param rng: random.Random
+    :return: str
+    """
+    if isinstance(values, list):
+        return rng.choice(values)
+    lo, hi = values
+    if lo.lstrip("-").isdigit() and hi.lstrip("-").isdigit():
+        return str(rng.randint(int(lo), int(hi)))
+    return "{0:.4g}".format(rng.uniform(float(lo), float(hi)))
+
+
+def combinations(settings, samples = None, seed = 0):
+    """
+    the settings of every cell of the sweep
+    :param settings: list of ("SECTION.key", values) from parse_setting
+    :param samples: number of random combinations, None for the whole grid
+    :param seed: seed for the random combinations
+    :return: list of dicts {"SECTION.key": value}
+    """
+    names = [name for name, values in settings]
+    if samples is None:
+        grid = itertools.product(*[values for name, values in settings])
+        return [dict(zip(names, values)) for values in grid]
+    rng = random.Random(seed)
+    return [dict((name, pick(values, rng)) for name, values in settings) for i in range(samples)]
+
+
+def cell_id(overrides, seed):
+    """
+    a name for a cell that stays the same from one run of the sweep to the next
+    :param overrides: {"SECTION.key": value}
+    :param seed: the cell's seed
+    :return: str
+    """
+    return hashlib.sha1(json.dumps([sorted(overrides.items()), seed]).encode()).hexdigest()[:12]
+
+
+def write_config(base, overrides, filename):
+    """
+    write a copy of a config file with some settings changed
+    :param base: the config file to copy
+    :param overrides: {"SECTION.key": value}
+    :param filename: where to write the copy
+    :return: None
+    """
+    config = configparser.ConfigParser()
+    config.read(base)
+    for name, value in overrides.items():
+        section, key = name.split(".", 1)
+        if not config.has_option(section, key):
+            raise ValueError("{0} has no setting {1} in [{2}]".format(base, key, section))
+        config.set(section, key, value)
+    with open(filename, "w") as f:
+        config.write(f)
+
+
+def read_results(filename):
+    """
+    :param filename: the sweep's results.csv
+    :return: (its columns, {cell id: its latest row}), ([], {}) if it doesn't exist yet
+    """
+    if not os.path.exists(filename):
+        return [], {}
+    with open(filename, newline = "") as f:
+        table = csv.DictReader(f)
+        rows = dict((row["cell"], row) for row in table if row.get("cell"))
+        return table.fieldnames or [], rows
+
+
+def run_cell(cell):
+    """
+    train one cell of the sweep in its own directory, with the output
+    going to train.log there. This is what each process of the pool runs
+    :param cell: dict with "cell", "seed", "config", "dir" and "generations"
+    :return: dict of the cell's name and RESULTS
+    """
+    os.makedirs(cell["dir"], exist_ok = True)
+    os.chdir(cell["dir"])
+    result = dict.fromkeys(RESULTS, "")
+    result["cell"] = cell["cell"]
+    start = time.time()
+    with open("train.log", "w") as log, contextlib.redirect_stdout(log):
+        try:
+            spec = importlib.util.spec_from_file_location("happy_bee", os.path.join(ROOT, "happy-bee.py"))
+            hb = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(hb)
+            hb.init_headless()
+            p = hb.run(cell["config"], headless = True, seed = cell["seed"], generations = cell["generations"])
+            threshold = p.config.fitness_threshold
+            solved = not p.config.no_fitness_termination and p.best_genome.fitness >= threshold
+            # neat stops in the generation that reaches the threshold, counting from 0
+            result["generations"] = p.generation + 1 if solved else ""
+            result["solved"] = int(solved)
+            result["best"] = p.best_genome.fitness
+        except Exception as e:
+            result["error"] = "{0}: {1}".format(type(e).__name__, e)
+    result["seconds"] = round(time.time() - start, 1)
+    return result
+
+
+def summary(rows, names):
+    """
+    print how each combination of settings did over its seeds, the
+    ones that reached the threshold most often and soonest first
+    :param rows: result rows
+    :param names: the "SECTION.key" of the settings
+    :return: None
+    """
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(row[name] for name in names), []).append(row)
+
+    lines = []
+    for values, group in groups.items():
+        solved = [int(row["generations"]) for row in group if row["generations"] not in ("", None)]
+        best = [float(row["best"]) for row in group if row["best"] not in ("", None)]
+        lines.append((-len(solved), sum(solved) / len(solved) if solved else float("inf"), values, len(group),
+                      max(best) if best else float("nan"),
+                      sum(float(row["seconds"]) for row in group) / len(group)))
+
+    texts = dict((values, " ".join("{0}={1}".format(name.split(".", 1)[1], value) for name, value in zip(names, values)))
+                 for values in groups)
+    width = max([len(text) for text in texts.values()] + [len("settings")]) + 2
+    print("{0:<{5}}{1:>8}{2:>12}{3:>12}{4:>10}".format("settings", "solved", "generations", "best", "seconds", width))
+    for unsolved, generations, values, runs, best, seconds in sorted(lines):
+        print("{0:<{5}}{1:>8}{2:>12}{3:>12.1f}{4:>10.0f}".format(
+            texts[values], "{0}/{1}".format(-unsolved, runs), "{0:.1f}".format(generations) if -unsolved else "-",
+            best, seconds, width))
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Happy Bee hyperparameter sweep")
+    parser.add_argument("--set", dest = "settings", action = "append", type = parse_setting, default = [],
+                        metavar = "SECTION.key=VALUES",
+                        help = "a setting to sweep: a list of values like 25,50, or with --random a range like 0.3:0.9")
+    parser.add_argument("--seeds", type = int, nargs = "+", default = [1],
+                        help = "seeds to train each combination with")
+    parser.add_argument("--random", type = int, default = None, metavar = "N",
+                        help = "train N random combinations instead of every combination")
+    parser.add_argument("--sweep-seed", type = int, default = 0,
+                        help = "seed for picking the random combinations")
+    parser.add_argument("--generations", type = int, default = 50,
+                        help = "generations each cell trains for at most")
+    parser.add_argument("--processes", type = int, default = 0,
+                        help = "cells trained at once, 0 for one per core")
+    parser.add_argument("--config", default = CONFIG_PATH,
+                        help = "config file the variants are made from")
+    parser.add_argument("--out", default = "sweep",
+                        help = "directory for the cells and results.csv")
+    args = parser.parse_args()
+    if any(isinstance(values, tuple) for name, values in args.settings) and args.random is None:
+        parser.error("ranges like 0.3:0.9 need --random")
+
+    names = [name for name, values in args.settings]
+    columns = ["cell", "seed"] + names + list(RESULTS)
+    results_file = os.path.join(args.out, "results.csv")
+    old_columns, done = read_results(results_file)
+    if old_columns and old_columns != columns:
+        parser.error("{0} is from a sweep of other settings ({1}), use another --out".format(
+            results_file, ", ".join(old_columns[2:-len(RESULTS)])))
+
+    # the cells that don't have results yet
+    config = os.path.abspath(args.config)
+    os.makedirs(os.path.join(args.out, "configs"), exist_ok = True)
+    cells = []
+    rows = []
+    for overrides in combinations(args.settings, args.random, args.sweep_seed):
+        for seed in args.seeds:
+            name = cell_id(overrides, seed)
+            row = dict(overrides, cell = name, seed = seed)
+            if name in done and not done[name]["error"]:
+                rows.append(done[name])
+                continue
+            variant = os.path.abspath(os.path.join(args.out, "configs", name + ".ini"))
+            try:
+                write_config(config, overrides, variant)
+            except ValueError as e:
+                parser.error(str(e))
+            cells.append((row, {"cell": name, "seed": seed, "config": variant, "generations": args.generations,
+                                "dir": os.path.abspath(os.path.join(args.out, "cells", name))}))
+
+    retried = sum(1 for row, cell in cells if cell["cell"] in done)
+    print("{0} cells, {1} already done, {2} failed before and tried again".format(
+        len(cells) + len(rows), len(rows), retried))
+    if cells:
+        if not old_columns:
+            with open(results_file, "w", newline = "") as f:
+                csv.DictWriter(f, columns).writeheader()
+
+        # a new process for each cell, so every run starts from a fresh happy-bee module
+        processes = args.processes or multiprocessing.cpu_count()
+        start = time.time()
+        with multiprocessing.Pool(min(processes, len(cells)), maxtasksperchild = 1) as pool:
+            by_name = dict((cell["cell"], row) for row, cell in cells)
+            for n, result in enumerate(pool.imap_unordered(run_cell, [cell for row, cell in cells]), 1):
+                row = dict(by_name[result["cell"]], **result)
+                rows.append(row)
+                with open(results_file, "a", newline = "") as f:
+                    csv.DictWriter(f, columns).writerow(row)
+                print("[{0}/{1}] {2} seed {3}: {4} ({5:.0f}s)".format(
+                    n, len(cells), row["cell"], row["seed"],
+                    row["error"] or "best {0:.1f}, solved in {1}".format(row["best"], row["generations"] or "-"),
+                    time.time() - start))
+
+    if rows:
+        summary(rows, names)
+
+if __name__ == '__main__':
+    main()
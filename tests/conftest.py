@@ -0,0 +1,40 @@
+import os
+import sys
+import importlib.util
+
+import pytest
+
+# the tests never open a window
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def hb(tmp_path, monkeypatch):
+    """
+    a fresh happy-bee module set up to train headless, working in a
+    temporary directory so nothing it saves ends up in the repo
+    """
+    monkeypatch.chdir(tmp_path)
+    spec = importlib.util.spec_from_file_location("happy_bee", os.path.join(ROOT, "happy-bee.py"))
+    module = importlib.util.module_from_spec(spec)
+    # so worker processes can find its functions
+    monkeypatch.setitem(sys.modules, "happy_bee", module)
+    spec.loader.exec_module(module)
+    module.init_headless()
+    module.HEADLESS = True
+    module.load_settings(module.CONFIG_PATH)
+    return module
+
+
+@pytest.fixture
+def config(hb):
+    """
+    the NEAT config training uses
+    """
+    import neat
+    from speciation import BatchSpeciesSet
+    return neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                              BatchSpeciesSet, neat.DefaultStagnation, hb.CONFIG_PATH)
@@ -0,0 +1,83 @@
+import io
+import random
+
+import neat
+import numpy as np
+import pytest
+
+from batchnet import BatchNetwork
+from cache import LRUCache
+
+
+@pytest.fixture
+def genomes(config):
+    """
+    genomes with hidden nodes, disabled connections and every activation BatchNetwork supports
+    """
+    random.seed(1)
+    genome_config = config.genome_config
+    genome_config.activation_options = ["sigmoid", "tanh", "relu", "identity"]
+    genome_config.activation_mutate_rate = 0.5
+    genomes = list(neat.Population(config).population.values())
+    for genome in genomes:
+        for i in range(random.randrange(20)):
+            genome.mutate(genome_config)
+    # offspring that only differ in their values share a layout
+    for genome in genomes[:5]:
+        twin = genome.__class__(genome.key + 1000)
+        twin.nodes = dict((key, node.copy()) for key, node in genome.nodes.items())
+        twin.connections = dict((key, conn.copy()) for key, conn in genome.connections.items())
+        for conn in twin.connections.values():
+            conn.weight += 0.5
+        genomes.append(twin)
+    assert any(len(genome.nodes) > 1 for genome in genomes)
+    return genomes
+
+
+def inputs(rows):
+    return np.random.default_rng(1).uniform(-300, 700, (rows, 3))
+
+
+def expected(genomes, config, x):
+    nets = [neat.nn.FeedForwardNetwork.create(genome, config) for genome in genomes]
+    return np.array([net.activate(row) for net, row in zip(nets, x.tolist())])
+
+
+def test_no_networks():
+    assert BatchNetwork([]).activate(np.zeros((0, 3))).shape == (0, 0)
+
+
+def test_matches_neat(genomes, config):
+    x = inputs(len(genomes))
+    nets = [neat.nn.FeedForwardNetwork.create(genome, config) for genome in genomes]
+    assert np.allclose(BatchNetwork(nets).activate(x), expected(genomes, config, x))
+    assert np.allclose(BatchNetwork.create(genomes, config).activate(x), expected(genomes, config, x))
+
+
+def test_layout_cache(genomes, config):
+    x = inputs(len(genomes))
+    cache = LRUCache(100)
+    cold = BatchNetwork.create(genomes, config, cache).activate(x)
+    assert cache.hits > 0
+    hits = cache.hits
+    warm = BatchNetwork.create(genomes, config, cache).activate(x)
+    assert cache.hits == hits + len(genomes)
+    assert np.array_equal(cold, warm)
+    assert np.allclose(warm, expected(genomes, config, x))
+
+
+def test_repeat(genomes, config):
+    copies = 3
+    x = inputs(len(genomes) * copies)
+    net = BatchNetwork.create(genomes, config).repeat(copies)
+    # copy c of network r is row c * networks + r
+    assert np.allclose(net.activate(x), expected(genomes * copies, config, x))
+
+
+def test_save_load(genomes, config):
+    x = inputs(len(genomes))
+    net = BatchNetwork.create(genomes, config)
+    file = io.BytesIO()
+    net.save(file)
+    file.seek(0)
+    assert np.array_equal(BatchNetwork.load(file).activate(x), net.activate(x))
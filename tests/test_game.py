@@ -0,0 +1,91 @@
+import numpy as np
+import pygame
+
+import game
+from game import Swarm, Pipe
+
+
+def images():
+    sky, ground, pipe, bee = game.load_images(convert = False)
+    game.prerotate(bee)
+    return pipe, bee
+
+
+def test_detail_draws_the_bees_lined_up_with_their_gap():
+    pipe_img, bee_img = images()
+    n = 200
+    swarm = Swarm(n, 230, 350, bee_img)
+    swarm.y[:] = np.linspace(0, 600, n)
+    gap = 300
+    shown, rest = swarm.detail(np.full(n, gap))
+    assert np.count_nonzero(shown) == Swarm.TOP + Swarm.SAMPLED
+    assert not (shown & rest).any() and (shown | rest).all()
+    # the TOP closest to the gap are all drawn
+    offset = np.abs(swarm.y + bee_img.get_height() / 2 - gap)
+    assert shown[np.argsort(offset)[:Swarm.TOP]].all()
+
+
+def test_swarm_moves_like_bees():
+    pipe_img, bee_img = images()
+    rng = np.random.default_rng(1)
+    n = 50
+    swarm = Swarm(n, 230, 350, bee_img)
+    bees = [game.Bee(230, 350, bee_img) for i in range(n)]
+    for frame in range(200):
+        flapping = swarm.alive & (rng.random(n) < 0.1)
+        swarm.flap(flapping)
+        swarm.move()
+        for bee, flap, alive in zip(bees, flapping.tolist(), swarm.alive.tolist()):
+            if flap:
+                bee.flap()
+            if alive:
+                bee.move()
+        assert swarm.y.tolist() == [bee.y for bee in bees]
+        assert swarm.tilt.tolist() == [bee.tilt for bee in bees]
+        # dead bees stay where they fell
+        swarm.alive &= rng.random(n) > 0.01
+
+
+
+def mask_hit(pipe, img, masks, x, y, tilt, top, bottom):
+    """
+    whether one bee hits a pipe, by overlapping its own rotated mask with the pipe's
+    """
+    mask, (dx, dy) = masks[tilt]
+    bee_x = x + dx
+    bee_y = round(y) + dy
+    upper, lower = masks["pipe"]
+    return bool(mask.overlap(upper, (pipe.x - bee_x, top - bee_y)) or mask.overlap(lower, (pipe.x - bee_x, bottom - bee_y)))
+
+
+def test_collide_all_matches_masks():
+    pipe_img, bee_img = images()
+    rng = np.random.default_rng(1)
+    n = 400
+    tilts = game.Bee.reachable_tilts()
+    # each tilt's mask and where its top left is, made here rather than with game's helpers
+    masks = {}
+    for tilt in tilts:
+        image = pygame.transform.rotate(bee_img, tilt) if tilt else bee_img
+        masks[tilt] = (pygame.mask.from_surface(image), image.get_rect(center = bee_img.get_rect().center).topleft)
+    masks["pipe"] = (pygame.mask.from_surface(pipe_img), pygame.mask.from_surface(game.flipped(pipe_img)))
+    heights = [250, 150, 350]
+    course = rng.integers(0, len(heights), n)
+    hits = 0
+    # the pipe's opaque columns are in the middle of its image, so it
+    # reaches the bees at x 230 from about x -10 to 120
+    for pipe_x in range(-30, 140, 7):
+        pipe = Pipe(pipe_x, pipe_img, heights)
+        ys = rng.uniform(50, 650, n)
+        bee_tilts = rng.choice(tilts, n)
+        alive = rng.random(n) > 0.1
+        hit = pipe.collide_all(bee_img, 230, ys, bee_tilts, alive, course)
+        expected = [a and mask_hit(pipe, bee_img, masks, 230, y, t, int(pipe.tops[k]), int(pipe.bottoms[k]))
+                    for y, t, a, k in zip(ys.tolist(), bee_tilts.tolist(), alive.tolist(), course.tolist())]
+        assert hit.tolist() == expected
+        hits += sum(expected)
+        # on one course, the pipe's first height is used
+        single = [a and mask_hit(pipe, bee_img, masks, 230, y, t, pipe.top, pipe.bottom)
+                  for y, t, a in zip(ys.tolist(), bee_tilts.tolist(), alive.tolist())]
+        assert pipe.collide_all(bee_img, 230, ys, bee_tilts, alive).tolist() == single
+    assert 0 < hits < n * 25
@@ -0,0 +1,44 @@
+import random
+
+import neat
+import pytest
+
+from speciation import BatchSpeciesSet
+
+
+def species_history(config, seed, generations):
+    """
+    evolve a population with made-up fitness, keeping which species each genome was in every generation
+    """
+    random.seed(seed)
+    p = neat.Population(config)
+    history = []
+
+    def fitness(genomes, config):
+        history.append(sorted(p.species.genome_to_species.items()))
+        for genome_id, genome in genomes:
+            genome.fitness = sum(conn.weight for conn in genome.connections.values())
+
+    p.run(fitness, generations)
+    return history
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_same_species_as_neat(hb, tmp_path, seed):
+    config_file = str(tmp_path / "default.ini")
+    with open(hb.CONFIG_PATH) as f:
+        text = f.read()
+    with open(config_file, "w") as f:
+        f.write(text.replace("[BatchSpeciesSet]", "[DefaultSpeciesSet]"))
+    default = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction, neat.DefaultSpeciesSet,
+                                 neat.DefaultStagnation, config_file)
+    batch = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction, BatchSpeciesSet,
+                               neat.DefaultStagnation, hb.CONFIG_PATH)
+    for config in (default, batch):
+        config.pop_size = 60
+        config.fitness_threshold = float("inf")
+        config.species_set_config.compatibility_threshold = 1.5
+
+    expected = species_history(default, seed, 8)
+    assert len(set(sid for generation in expected for gid, sid in generation)) > 1
+    assert species_history(batch, seed, 8) == expected
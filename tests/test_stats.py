@@ -0,0 +1,31 @@
+import pytest
+
+import stats
+from reporters import StatsWriter
+from writer import BackgroundWriter
+
+
+def record(generation):
+    return {"generation": generation, "best": 10.0 + generation, "mean": 5.0, "stdev": 1.0, "species": 1,
+            "genomes": 25, "best_nodes": 2, "best_connections": 3, "seconds": 0.5}
+
+
+@pytest.mark.parametrize("name", ["stats.csv", "stats.jsonl"])
+def test_resume_drops_later_generations(tmp_path, name):
+    # a run that got to generation 9 is resumed from a checkpoint of generation 5
+    filename = str(tmp_path / name)
+    with open(filename, "w") as f:
+        f.write(stats.header(filename) + "".join(stats.format_record(record(g), filename) for g in range(10)))
+    writer = BackgroundWriter()
+    StatsWriter(writer, filename, 5)
+    writer.flush()
+    assert list(stats.read_stats(filename)) == [record(g) for g in range(5)]
+
+
+def test_plot_stats_file(tmp_path):
+    import visualize
+    filename = str(tmp_path / "stats.csv")
+    with open(filename, "w") as f:
+        f.write(stats.header(filename) + "".join(stats.format_record(record(g), filename) for g in range(30)))
+    visualize.plot_stats_file(filename, max_points = 10, filename = str(tmp_path / "fitness.svg"))
+    assert (tmp_path / "fitness.svg").exists()
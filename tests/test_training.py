@@ -0,0 +1,144 @@
+import csv
+import json
+import random
+
+import neat
+import pytest
+
+from cache import FitnessCache
+
+
+def population(config, seed = 3):
+    random.seed(seed)
+    return neat.Population(config)
+
+
+def test_every_genome_cached(hb, config):
+    # on a fixed course, a generation where every genome already flew it has nothing left to simulate
+    hb.FIXED_COURSE = True
+    hb.SEED = 3
+    hb.FITNESS_CACHE = FitnessCache(100)
+    genomes = list(population(config).population.items())
+    hb.eval_genomes(genomes, config)
+    fitness = [genome.fitness for genome_id, genome in genomes]
+    for genome_id, genome in genomes:
+        genome.fitness = None
+    hb.eval_genomes(genomes, config)
+    assert [genome.fitness for genome_id, genome in genomes] == fitness
+    assert hb.simulate([], config, hb.generation_courses(3)) == []
+
+
+def test_every_genome_cached_with_workers(hb, config):
+    hb.FIXED_COURSE = True
+    hb.SEED = 3
+    hb.FITNESS_CACHE = FitnessCache(100)
+    genomes = list(population(config).population.items())
+    evaluator = hb.ParallelEvaluator(2, hb.CONFIG_PATH)
+    try:
+        evaluator.evaluate(genomes, config)
+        fitness = [genome.fitness for genome_id, genome in genomes]
+        for genome_id, genome in genomes:
+            genome.fitness = None
+        evaluator.evaluate(genomes, config)
+    finally:
+        evaluator.pool.terminate()
+    assert [genome.fitness for genome_id, genome in genomes] == fitness
+
+
+def test_stop(hb, monkeypatch):
+    # STOP clicked partway through a generation ends training after it,
+    # and the bees of that generation keep the fitness they had earned
+    move = hb.Swarm.move
+    flying = []
+    def stop_in_second_generation(bees):
+        move(bees)
+        if hb.gen == 2 and not hb.STOPPED:
+            flying.append(bees.alive.sum())
+            if len(flying) == 20:
+                hb.STOPPED = True
+    monkeypatch.setattr(hb.Swarm, "move", stop_in_second_generation)
+    p = hb.run(hb.CONFIG_PATH, headless = True, seed = 3, generations = 5)
+    assert p.generation == 1
+    assert len(flying) == 20 and flying[-1] > 0
+    assert all(genome.fitness > 0 for genome in p.population.values())
+    assert max(genome.fitness for genome in p.population.values()) > 1.9
+    assert p.best_genome.fitness < p.config.fitness_threshold
+
+
+def test_stop_from_the_window_in_short_generations(hb, monkeypatch):
+    # generations much shorter than a published frame still take STOP from watch_training
+    import multiprocessing
+
+    class Frames:
+        def write(self, *frame):
+            pass
+
+    window, conn = multiprocessing.Pipe()
+    monkeypatch.setattr(hb, "SNAPSHOT", Frames())
+    monkeypatch.setattr(hb, "CONTROL", conn)
+    monkeypatch.setattr(hb, "over_limit", lambda frame, *limits: frame >= 3)
+    course_seed = hb.course_seed
+    def stop_in_second_generation():
+        if hb.gen == 2:
+            window.send("stop")
+        return course_seed()
+    monkeypatch.setattr(hb, "course_seed", stop_in_second_generation)
+    p = hb.run(hb.CONFIG_PATH, headless = True, seed = 3, generations = 5)
+    assert p.generation == 1
+    assert not conn.poll()
+
+
+def test_workers_match_serial(hb, config):
+    hb.SEED = 3
+    genomes = list(population(config).population.items())
+    hb.eval_genomes(genomes, config)
+    serial = [genome.fitness for genome_id, genome in genomes]
+
+    hb.gen = 0
+    evaluator = hb.ParallelEvaluator(3, hb.CONFIG_PATH)
+    try:
+        evaluator.evaluate(genomes, config)
+    finally:
+        evaluator.pool.terminate()
+    assert [genome.fitness for genome_id, genome in genomes] == serial
+
+
+def test_workers_end_at_the_threshold(hb, config, tmp_path):
+    # on several courses a share of the genomes can reach the threshold
+    # later than the generation does, and has to fly again up to where it ended
+    config_file = str(tmp_path / "courses.ini")
+    with open(hb.CONFIG_PATH) as f:
+        text = f.read()
+    with open(config_file, "w") as f:
+        f.write(text.replace("courses               = 1", "courses               = 3"))
+    hb.load_settings(config_file)
+    assert hb.COURSES == 3
+    config.fitness_threshold = 10
+    hb.SEED = 3
+    genomes = list(population(config).population.items())
+    hb.eval_genomes(genomes, config)
+    serial = [genome.fitness for genome_id, genome in genomes]
+    assert max(serial) >= config.fitness_threshold > min(serial)
+
+    hb.gen = 0
+    evaluator = hb.ParallelEvaluator(3, config_file)
+    try:
+        evaluator.evaluate(genomes, config)
+    finally:
+        evaluator.pool.terminate()
+    assert [genome.fitness for genome_id, genome in genomes] == serial
+
+
+@pytest.mark.parametrize("name", ["profile.csv", "profile.jsonl"])
+def test_profile_adds_a_line_each_generation(hb, name):
+    import profiler
+    hb.run(hb.CONFIG_PATH, headless = True, seed = 3, profile = name, generations = 3)
+    with open(name) as f:
+        lines = f.read().splitlines()
+    if profiler.is_json(name):
+        records = [json.loads(line) for line in lines]
+    else:
+        assert lines[0] == ",".join(profiler.FIELDS)
+        records = list(csv.DictReader(lines))
+    assert [int(record["generation"]) for record in records] == [0, 1, 2]
+    assert all(int(record["frames"]) > 0 for record in records)
@@ -7,17 +7,13 @@ import graphviz
 import matplotlib.pyplot as plt
 import numpy as np
 
+import stats
 
-def plot_stats(statistics, ylog=False, view=False, filename='avg_fitness.svg'):
-    """ Plots the population's average and best fitness. """
-    if plt is None:
-        warnings.warn("This display is not available due to a missing optional dependency (matplotlib)")
-        return
 
-    generation = range(len(statistics.most_fit_genomes))
-    best_fitness = [c.fitness for c in statistics.most_fit_genomes]
-    avg_fitness = np.array(statistics.get_fitness_mean())
-    stdev_fitness = np.array(statistics.get_fitness_stdev())
+def plot_fitness(generation, best_fitness, avg_fitness, stdev_fitness, ylog=False, view=False, filename='avg_fitness.svg'):
+    """ Plots the average (with its standard deviation) and best fitness of each generation. """
+    avg_fitness = np.array(avg_fitness)
+    stdev_fitness = np.array(stdev_fitness)
 
     plt.plot(generation, avg_fitness, 'b-', label="average")
     plt.plot(generation, avg_fitness - stdev_fitness, 'g-.', label="-1 sd")
@@ -37,3 +33,49 @@ def plot_stats(statistics, ylog=False, view=False, filename='avg_fitness.svg'):
         plt.show()
 
     plt.close()
+
+
+def plot_stats(statistics, ylog=False, view=False, filename='avg_fitness.svg'):
+    """ Plots the population's average and best fitness. """
+    if plt is None:
+        warnings.warn("This display is not available due to a missing optional dependency (matplotlib)")
+        return
+
+    generation = range(len(statistics.most_fit_genomes))
+    best_fitness = [c.fitness for c in statistics.most_fit_genomes]
+    plot_fitness(generation, best_fitness, statistics.get_fitness_mean(), statistics.get_fitness_stdev(),
+                 ylog, view, filename)
+
+
+def plot_stats_file(stats_file, max_points=500, ylog=False, view=False, filename='avg_fitness.svg'):
+    """
+    Plots the population's average and best fitness from a statistics file written by
+    reporters.StatsWriter. Long runs are downsampled to at most max_points points
+    (the best of each run of generations, and their average), reading the file in
+    constant memory.
+    """
+    if plt is None:
+        warnings.warn("This display is not available due to a missing optional dependency (matplotlib)")
+        return
+
+    records = sum(1 for record in stats.read_stats(stats_file))
+    step = max(1, -(-records // max_points))
+
+    generation, best_fitness, avg_fitness, stdev_fitness = [], [], [], []
+
+    def add_point(bucket):
+        generation.append(bucket[-1]["generation"])
+        best_fitness.append(max(r["best"] for r in bucket))
+        avg_fitness.append(sum(r["mean"] for r in bucket) / len(bucket))
+        stdev_fitness.append(sum(r["stdev"] for r in bucket) / len(bucket))
+
+    bucket = []
+    for record in stats.read_stats(stats_file):
+        bucket.append(record)
+        if len(bucket) == step:
+            add_point(bucket)
+            bucket = []
+    if bucket:
+        add_point(bucket)
+
+    plot_fitness(generation, best_fitness, avg_fitness, stdev_fitness, ylog, view, filename)
@@ -0,0 +1,92 @@
+import os
+import gzip
+import queue
+import atexit
+import threading
+
+
+def write_atomic(filename, data):
+    """
+    write a file so it is either all there or not changed at all: the data
+    goes to a temporary file next to it first, which then replaces it
+    :param filename: file to write
+    :param data: bytes
+    :return: None
+    """
+    temp = "{0}.tmp".format(filename)
+    with open(temp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, filename)
+
+
+class BackgroundWriter:
+    """
+    Writes files atomically on a background thread, so training
+    never waits on the disk. The thread starts with the first write
+    and anything still queued is written before the program exits
+    """
+
+    def __init__(self):
+        """
+        Initialize the object
+        :return: None
+        """
+        self.queue = queue.Queue()
+        self.thread = None
+
+    def write(self, filename, data, compress = False):
+        """
+        queue a file to be written
+        :param filename: file to write
+        :param data: bytes, already serialized so later changes can't reach them
+        :param compress: gzip the data first (on the background thread)
+        :return: None
+        """
+        self.put(filename, data, compress, False)
+
+    def append(self, filename, data):
+        """
+        queue data to be added to the end of a file. Appends aren't atomic,
+        a crash can leave the last one cut short
+        :param filename: file to add to, created if it doesn't exist
+        :param data: bytes
+        :return: None
+        """
+        self.put(filename, data, False, True)
+
+    def put(self, filename, data, compress, append):
+        if self.thread is None:
+            self.thread = threading.Thread(target = self.work, name = "BackgroundWriter", daemon = True)
+            self.thread.start()
+            atexit.register(self.flush)
+        self.queue.put((filename, data, compress, append))
+
+    def work(self):
+        """
+        write the queued files one at a time, forever
+        :return: None
+        """
+        while True:
+            filename, data, compress, append = self.queue.get()
+            try:
+                if compress:
+                    data = gzip.compress(data, compresslevel = 5)
+                if append:
+                    with open(filename, "ab") as f:
+                        f.write(data)
+                else:
+                    write_atomic(filename, data)
+            except OSError as e:
+                print("Could not write {0}: {1}".format(filename, e))
+            finally:
+                self.queue.task_done()
+
+    def flush(self):
+        """
+        wait until every queued file is written
+        :return: None
+        """
+        if self.thread is not None:
+            self.queue.join()